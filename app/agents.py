@@ -1,85 +1,346 @@
 from __future__ import annotations
 
+import asyncio
 import json
-import os
 import re
-from typing import Any, Dict, List
+import time
+from typing import Any, Callable, Dict, List, Optional
 
 
 from . import config  
+from .cache import TTLCache, stable_hash
+from .audit_rules import pre_audit
+from .backends import llm_identity, make_llm
+from .metrics import stage
+from .prompting import (
+    FORMAT_VERSION, compact_client, compact_market, dedupe_evidence, dumps, encode_evidence, fit_to_budget,
+)
+
 
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+# Chat model, created on first use or by prepare(); benchmarks may assign their own.
+llm = None
 
+# Process-wide cap on in-flight LLM calls, shared by every request.
+_llm_slots = asyncio.Semaphore(config.LLM_MAX_CONCURRENCY)
 
+# (role, template) messages per prompt. The ChatPromptTemplate objects are
+# built on first use, since langchain_core.prompts is slow to import.
+# Static text (instructions, output schema) comes first and the client and
+# market next, so calls for the same request share the longest possible
+# prefix (provider-side prompt caching); per-product content comes last.
+_PROMPT_SPECS: Dict[str, list] = {}
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.2,
-    api_key=os.environ["OPENAI_API_KEY"],
+_RECOMMENDER = (
+    "You are a conservative wealth management AI assistant. "
+    "Do NOT promise returns. Use cautious language. "
+    "Always include key risks and who should not buy. "
+    "If evidence is insufficient, explicitly say so in the reasons. "
+)
+_AUDITOR = (
+    "You are a strict compliance/audit reviewer for wealth management recommendations. "
+    "Check for: (1) guaranteed-return language, (2) missing risk disclosures, "
+    "(3) suitability violations vs client profile, (4) claims not supported by evidence. "
+)
+_INPUTS = "Inputs are compact JSON; evidence maps doc_id to RAG snippets of that document. "
+_OUTPUT = "You MUST output strictly valid JSON only (no markdown, no extra text) with this schema:\n"
+_RECO_SCHEMA = (
+    "\"why_client_fit\": string, "
+    "\"why_market_fit\": string, "
+    "\"key_risks\": [string], "
+    "\"who_should_not_buy\": [string]"
+)
+_AUDIT_SCHEMA = "\"is_ok\": boolean, \"issues\": [string], \"revised\": {{" + _RECO_SCHEMA + "}}"
+_CONTEXT = "Client:\n{client}\n\nMarket:\n{market}\n\n"
+
+_PROMPT_SPECS["RECOMMEND_PROMPT"] = [
+    ("system", _RECOMMENDER + _INPUTS + _OUTPUT + "{{" + _RECO_SCHEMA + "}}"),
+    ("user", _CONTEXT + "Candidate product:\n{product}\n\nEvidence:\n{evidence}"),
+]
+
+_PROMPT_SPECS["AUDIT_PROMPT"] = [
+    ("system", _AUDITOR + _INPUTS + _OUTPUT + "{{" + _AUDIT_SCHEMA + "}}"),
+    ("user", _CONTEXT + "Product:\n{product}\n\nEvidence:\n{evidence}\n\nDraft:\n{draft}"),
+]
+
+# Multi-product variants: client/market/system text sent once for all products.
+_PROMPT_SPECS["RECOMMEND_MANY_PROMPT"] = [
+    (
+        "system",
+        _RECOMMENDER + _INPUTS
+        + "Each candidate has product_id, structured fields and its own evidence. "
+        "For EACH candidate, using only its own evidence, write one item. "
+        + _OUTPUT + "{{\"items\": [{{\"product_id\": string, " + _RECO_SCHEMA + "}}]}}",
+    ),
+    ("user", _CONTEXT + "Candidate products:\n{products}"),
+]
+
+_PROMPT_SPECS["AUDIT_MANY_PROMPT"] = [
+    (
+        "system",
+        _AUDITOR + _INPUTS
+        + "Each product has product_id, product fields, its draft recommendation and its own evidence. "
+        "Audit EACH product separately. "
+        + _OUTPUT + "{{\"items\": [{{\"product_id\": string, " + _AUDIT_SCHEMA + "}}]}}",
+    ),
+    ("user", _CONTEXT + "Products:\n{items}"),
+]
+
+
+_prompts: Dict[str, Any] = {}
+
+
+def prompt(name: str):
+    """ChatPromptTemplate for one of _PROMPT_SPECS, built once."""
+    p = _prompts.get(name)
+    if p is None:
+        from langchain_core.prompts import ChatPromptTemplate
+
+        p = _prompts[name] = ChatPromptTemplate.from_messages(_PROMPT_SPECS[name])
+    return p
+
+
+def __getattr__(name: str):
+    # agents.RECOMMEND_PROMPT etc. (scripts)
+    if name in _PROMPT_SPECS:
+        return prompt(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _get_llm():
+    global llm
+    if llm is None:
+        llm = make_llm()
+    return llm
+
+
+def prepare() -> None:
+    """Create the chat client and prompt templates ahead of the first request."""
+    _get_llm()
+    for name in _PROMPT_SPECS:
+        prompt(name)
+
+
+# Changing any prompt, how it is filled in or the model changes this, which orphans old cache entries.
+PROMPT_VERSION = stable_hash(
+    [[template for _, template in _PROMPT_SPECS[name]] for name in _PROMPT_SPECS]
+    + list(llm_identity())
+    + [FORMAT_VERSION, config.PROMPT_TOKEN_BUDGET]
 )
 
+# LLM round trips and token usage (from the provider's usage metadata).
+llm_usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "batched_calls": 0, "batch_fallbacks": 0,
+             "json_parse_failures": 0, "budget_trimmed_calls": 0, "budget_dropped_snippets": 0}
 
+# Local pre-audit outcomes, LLM audit revisions and time spent in each audit stage.
+audit_stats = {"drafts": 0, "local_ok": 0, "escalated_flagged": 0, "escalated_undecided": 0,
+               "llm_audited": 0, "llm_revised": 0, "local_ms": 0.0, "llm_ms": 0.0}
 
-RECOMMEND_PROMPT = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            "You are a conservative wealth management AI assistant. "
-            "Do NOT promise returns. Use cautious language. "
-            "Always include key risks and who should not buy. "
-            "You MUST output strictly valid JSON only (no markdown, no extra text). "
-            "If evidence is insufficient, explicitly say so in the reasons.",
-        ),
-        (
-            "user",
-            "Client profile (JSON):\n{client}\n\n"
-            "Market context (JSON):\n{market}\n\n"
-            "Candidate product (structured fields JSON):\n{product}\n\n"
-            "Evidence snippets (RAG, list of dicts):\n{evidence}\n\n"
-            "Task: Output JSON ONLY with this schema:\n"
-            "{{"
-            "\"why_client_fit\": string, "
-            "\"why_market_fit\": string, "
-            "\"key_risks\": [string], "
-            "\"who_should_not_buy\": [string]"
-            "}}",
-        ),
-    ]
-)
 
-AUDIT_PROMPT = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            "You are a strict compliance/audit reviewer for wealth management recommendations. "
-            "Check for: (1) guaranteed-return language, (2) missing risk disclosures, "
-            "(3) suitability violations vs client profile, (4) claims not supported by evidence. "
-            "You MUST output strictly valid JSON only (no markdown, no extra text).",
-        ),
-        (
-            "user",
-            "Client (JSON):\n{client}\n\n"
-            "Market (JSON):\n{market}\n\n"
-            "Product (JSON):\n{product}\n\n"
-            "Draft recommendation JSON:\n{draft}\n\n"
-            "Evidence snippets:\n{evidence}\n\n"
-            "Output JSON ONLY with this schema:\n"
-            "{{"
-            "\"is_ok\": boolean, "
-            "\"issues\": [string], "
-            "\"revised\": {{"
-            "\"why_client_fit\": string, "
-            "\"why_market_fit\": string, "
-            "\"key_risks\": [string], "
-            "\"who_should_not_buy\": [string]"
-            "}}"
-            "}}",
-        ),
-    ]
+def audit_summary() -> Dict[str, Any]:
+    n = audit_stats["drafts"]
+    escalated = audit_stats["escalated_flagged"] + audit_stats["escalated_undecided"]
+    return dict(
+        audit_stats,
+        escalation_rate=escalated / n if n else 0.0,
+        avg_local_ms=audit_stats["local_ms"] / n if n else 0.0,
+        avg_llm_ms=audit_stats["llm_ms"] / escalated if escalated else 0.0,
+        revision_rate=audit_stats["llm_revised"] / audit_stats["llm_audited"] if audit_stats["llm_audited"] else 0.0,
+    )
+
+
+def _local_audit(
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    product: Dict[str, Any],
+    draft: Dict[str, Any],
+    evidence: List[Dict[str, str]],
+) -> Optional[Dict[str, Any]]:
+    """The pre-audit result if it clears the draft, else None (LLM audit needed)."""
+    if not config.LOCAL_PRE_AUDIT:
+        return None
+    t0 = time.perf_counter()
+    with stage("pre_audit"):
+        res = pre_audit(client, market, product, draft, evidence, config.PRE_AUDIT_MIN_SUPPORT)
+    audit_stats["local_ms"] += (time.perf_counter() - t0) * 1000
+    audit_stats["drafts"] += 1
+    if res is None:
+        audit_stats["escalated_undecided"] += 1
+    elif not res["is_ok"]:
+        audit_stats["escalated_flagged"] += 1
+    else:
+        audit_stats["local_ok"] += 1
+        return res
+    return None
+
+rationale_cache = TTLCache(
+    maxsize=config.RATIONALE_CACHE_SIZE,
+    ttl=config.RATIONALE_CACHE_TTL_S,
+    path=config.RATIONALE_CACHE_PATH or None,
 )
 
 
+def rationale_key(
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    product: Dict[str, Any],
+    evidence: List[Dict[str, str]],
+) -> str:
+    """
+    Cache key for a final rationale: client profile without client_id,
+    market, product row, evidence hash and prompt version.
+    """
+    profile = {k: v for k, v in client.items() if k != "client_id"}
+    profile["constraints"] = sorted(profile.get("constraints", []))
+    return stable_hash(
+        {
+            "prompt": PROMPT_VERSION,
+            "client": profile,
+            "market": market,
+            "product": product,
+            "evidence": stable_hash(evidence),
+        }
+    )
+
+
+async def explain_one(
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    product: Dict[str, Any],
+    evidence: List[Dict[str, str]],
+) -> Dict[str, Any]:
+    """
+    Draft + audit for ONE product, returning the final rationale
+    (the audit's revision if it flagged the draft). Served from
+    rationale_cache when the same inputs were seen before.
+    """
+    key = rationale_key(client, market, product, evidence)
+    cached = rationale_cache.get(key)
+    if cached is not None:
+        return cached
+
+    draft = await recommend_one(client, market, product, evidence)
+    audit = _local_audit(client, market, product, draft, evidence)
+    if audit is None:
+        audit = await audit_one(client, market, product, draft, evidence)
+        audit_stats["llm_audited"] += 1
+
+    final = audit["revised"] if not audit.get("is_ok", True) else draft
+    audit_stats["llm_revised"] += not audit.get("is_ok", True)
+    if not _is_fallback(final):
+        rationale_cache.set(key, final)
+    return final
+
+
+async def explain_many(
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    products: List[Dict[str, Any]],
+    evidences: List[List[Dict[str, str]]],
+) -> List[Dict[str, Any]]:
+    """
+    explain_one for several products with one drafting call and one audit
+    call for all cache misses. Every item is validated on its own; items
+    the batched output got wrong are redone with per-product calls.
+    """
+    keys = [rationale_key(client, market, p, ev) for p, ev in zip(products, evidences)]
+    finals: List[Any] = [rationale_cache.get(k) for k in keys]
+    todo = [i for i, f in enumerate(finals) if f is None]
+    if len(todo) < 2:
+        for i in todo:
+            finals[i] = await explain_one(client, market, products[i], evidences[i])
+        return finals
+
+    drafts = await recommend_many(client, market, [products[i] for i in todo], [evidences[i] for i in todo])
+    # per-product redos run concurrently; _invoke holds _llm_slots for each call
+    redo = [j for j, d in enumerate(drafts) if d is None]
+    for j, d in zip(redo, await asyncio.gather(
+        *(recommend_one(client, market, products[todo[j]], evidences[todo[j]]) for j in redo)
+    )):
+        drafts[j] = d
+    audits = [_local_audit(client, market, products[i], d, evidences[i]) for i, d in zip(todo, drafts)]
+    escalate = [j for j, a in enumerate(audits) if a is None]
+    audit_stats["llm_audited"] += len(escalate)
+    if len(escalate) > 1:
+        t0 = time.perf_counter()
+        batch = await audit_many(
+            client, market, [products[todo[j]] for j in escalate], [drafts[j] for j in escalate],
+            [evidences[todo[j]] for j in escalate],
+        )
+        audit_stats["llm_ms"] += (time.perf_counter() - t0) * 1000
+        for j, a in zip(escalate, batch):
+            audits[j] = a
+    redo = [j for j, a in enumerate(audits) if a is None]
+    for j, a in zip(redo, await asyncio.gather(
+        *(audit_one(client, market, products[todo[j]], drafts[j], evidences[todo[j]]) for j in redo)
+    )):
+        audits[j] = a
+    for i, draft, audit in zip(todo, drafts, audits):
+        final = audit["revised"] if not audit.get("is_ok", True) else draft
+        audit_stats["llm_revised"] += not audit.get("is_ok", True)
+        if not _is_fallback(final):
+            rationale_cache.set(keys[i], final)
+        finals[i] = final
+    return finals
+
+
+async def recommend_many(
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    products: List[Dict[str, Any]],
+    evidences: List[List[Dict[str, str]]],
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Draft rationales for several products in one call. Returns one entry per
+    product, None where the output for that product is missing or malformed.
+    """
+    msg = _format(
+        "RECOMMEND_MANY_PROMPT", client, market, evidences,
+        lambda evs: {"products": dumps([dict(p, evidence=encode_evidence(ev)) for p, ev in zip(products, evs)])},
+    )
+    with stage("draft"):
+        res = await _invoke(msg, batched=True)
+
+    items = _items_by_product(_safe_json(res.content))
+    out = []
+    for p in products:
+        item = items.get(p["product_id"])
+        out.append(_ensure_reco_schema(item) if _is_complete_reco(item) else None)
+    return _count_fallbacks(out)
+
+
+async def audit_many(
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    products: List[Dict[str, Any]],
+    drafts: List[Dict[str, Any]],
+    evidences: List[List[Dict[str, str]]],
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Audit several drafts in one call. Returns one entry per product, None
+    where the output for that product is missing or malformed.
+    """
+    msg = _format(
+        "AUDIT_MANY_PROMPT", client, market, evidences,
+        lambda evs: {"items": dumps(
+            [dict(p, draft=d, evidence=encode_evidence(ev)) for p, d, ev in zip(products, drafts, evs)]
+        )},
+    )
+    with stage("audit"):
+        res = await _invoke(msg, batched=True)
+
+    items = _items_by_product(_safe_json(res.content))
+    out = []
+    for p in products:
+        item = items.get(p["product_id"])
+        ok = (
+            isinstance(item, dict)
+            and isinstance(item.get("is_ok"), bool)
+            and (item["is_ok"] or _is_complete_reco(item.get("revised")))
+        )
+        out.append(_ensure_audit_schema(item) if ok else None)
+    return _count_fallbacks(out)
+
+
 async def recommend_one(
     client: Dict[str, Any],
     market: Dict[str, Any],
@@ -91,13 +352,12 @@ async def recommend_one(
     Always returns a dict with keys:
     why_client_fit, why_market_fit, key_risks, who_should_not_buy
     """
-    msg = RECOMMEND_PROMPT.format_messages(
-        client=json.dumps(client, ensure_ascii=False),
-        market=json.dumps(market, ensure_ascii=False),
-        product=json.dumps(product, ensure_ascii=False),
-        evidence=json.dumps(evidence, ensure_ascii=False),
+    msg = _format(
+        "RECOMMEND_PROMPT", client, market, [evidence],
+        lambda evs: {"product": dumps(product), "evidence": dumps(encode_evidence(evs[0]))},
     )
-    res = await llm.ainvoke(msg)
+    with stage("draft"):
+        res = await _invoke(msg)
 
     data = _safe_json(res.content)
     return _ensure_reco_schema(data)
@@ -111,19 +371,149 @@ async def audit_one(
     evidence: List[Dict[str, str]],
 ) -> Dict[str, Any]:
     
-    msg = AUDIT_PROMPT.format_messages(
-        client=json.dumps(client, ensure_ascii=False),
-        market=json.dumps(market, ensure_ascii=False),
-        product=json.dumps(product, ensure_ascii=False),
-        draft=json.dumps(draft, ensure_ascii=False),
-        evidence=json.dumps(evidence, ensure_ascii=False),
+    msg = _format(
+        "AUDIT_PROMPT", client, market, [evidence],
+        lambda evs: {"product": dumps(product), "evidence": dumps(encode_evidence(evs[0])), "draft": dumps(draft)},
     )
-    res = await llm.ainvoke(msg)
+    t0 = time.perf_counter()
+    with stage("audit"):
+        res = await _invoke(msg)
+    audit_stats["llm_ms"] += (time.perf_counter() - t0) * 1000
 
     data = _safe_json(res.content)
     return _ensure_audit_schema(data)
 
 
+def fallback_rationale() -> Dict[str, Any]:
+    """
+    Rationale used when a product's draft/audit chain fails,
+    so one bad item does not fail the whole response.
+    """
+    return _ensure_reco_schema({})
+
+
+def _doc_sections(evidence: List[Dict[str, str]]):
+    """Bullets per markdown heading, and a prose line (Summary first), across the snippets."""
+    sections: Dict[str, List[str]] = {}
+    prose: Dict[Optional[str], str] = {}
+    for e in evidence:
+        lines = e["snippet"].splitlines()
+        if len(e["snippet"]) >= 400:
+            lines = lines[:-1]  # snippets are cut at 400 chars
+        heading = None
+        for line in (l.strip() for l in lines):
+            if line.startswith("#"):
+                heading = line.lstrip("#").strip().lower()
+            elif line.startswith("- ") and heading:
+                sections.setdefault(heading, []).append(line[2:].strip())
+            elif len(line) > 30 and not line.startswith("**"):
+                prose.setdefault(heading, line)
+    first = prose.get("summary") or next(iter(prose.values()), None)
+    return {h: list(dict.fromkeys(b)) for h, b in sections.items()}, first
+
+
+def template_rationale(
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    product: Dict[str, Any],
+    evidence: List[Dict[str, str]],
+) -> Dict[str, Any]:
+    """
+    Deterministic rationale from the product row and evidence, used when
+    the LLM chain cannot finish within the request's latency budget.
+    """
+    sections, prose = _doc_sections(evidence)
+    risk, lockup = product.get("risk_level"), product.get("lockup_days")
+
+    why_client_fit = (
+        f"{product.get('name', product.get('product_id'))} (risk level {risk}, lock-up {lockup} days) "
+        f"passed the suitability screen for a client with risk tolerance {client.get('risk_tolerance')}, "
+        f"a {client.get('horizon_months')}-month horizon and a {client.get('goal')} goal."
+    )
+    why_market_fit = (
+        f"Ranked by base score for a {market.get('interest_rate_trend')} rate, "
+        f"{market.get('volatility_level')} volatility market."
+    )
+    if prose:
+        why_market_fit += f" From the product documentation: {prose}"
+
+    key_risks = sections.get("key risks") or [f"Market risk: the value can fluctuate (risk level {risk} of 5)"]
+    if lockup and not sections.get("key risks"):
+        key_risks.append(f"Liquidity risk: capital is locked up for {lockup} days")
+    who_should_not_buy = sections.get("not suitable for") or [f"Clients with a risk tolerance below {risk}"]
+
+    return {
+        "why_client_fit": why_client_fit,
+        "why_market_fit": why_market_fit,
+        "key_risks": key_risks,
+        "who_should_not_buy": who_should_not_buy,
+    }
+
+
+def _is_fallback(reco: Dict[str, Any]) -> bool:
+    # don't cache output that _ensure_reco_schema had to patch up
+    fb = fallback_rationale()
+    return any(reco[k] == fb[k] for k in ("why_client_fit", "why_market_fit", "key_risks"))
+
+
+def _items_by_product(data: Dict[str, Any]) -> Dict[str, Any]:
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return {}
+    return {x["product_id"]: x for x in items if isinstance(x, dict) and isinstance(x.get("product_id"), str)}
+
+
+def _is_complete_reco(data: Any) -> bool:
+    # stricter than _ensure_reco_schema: nothing may need patching
+    return (
+        isinstance(data, dict)
+        and all(isinstance(data.get(k), str) for k in ("why_client_fit", "why_market_fit"))
+        and all(
+            isinstance(data.get(k), list) and all(isinstance(x, str) for x in data[k])
+            for k in ("key_risks", "who_should_not_buy")
+        )
+    )
+
+
+def _count_fallbacks(items: List[Optional[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+    llm_usage["batch_fallbacks"] += sum(x is None for x in items)
+    return items
+
+
+def _format(
+    name: str,
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    evidences: List[List[Dict[str, str]]],
+    fields: Callable[[List[List[Dict[str, str]]]], Dict[str, str]],
+) -> list:
+    """
+    Messages for prompt(name): compact client and market JSON, fields(evidences)
+    for the per-product variables, with each product's evidence deduped and
+    then trimmed to config.PROMPT_TOKEN_BUDGET (see prompting.fit_to_budget).
+    """
+    context = {"client": dumps(compact_client(client)), "market": dumps(compact_market(market))}
+    msg, dropped = fit_to_budget(
+        lambda evs: prompt(name).format_messages(**context, **fields(evs)),
+        [dedupe_evidence(ev) for ev in evidences],
+        config.PROMPT_TOKEN_BUDGET,
+    )
+    llm_usage["budget_trimmed_calls"] += dropped > 0
+    llm_usage["budget_dropped_snippets"] += dropped
+    return msg
+
+
+async def _invoke(msg, batched: bool = False):
+    async with _llm_slots:
+        res = await _get_llm().ainvoke(msg)
+    usage = getattr(res, "usage_metadata", None) or {}
+    llm_usage["calls"] += 1
+    llm_usage["batched_calls"] += batched
+    llm_usage["input_tokens"] += usage.get("input_tokens", 0)
+    llm_usage["output_tokens"] += usage.get("output_tokens", 0)
+    return res
+
+
 def _safe_json(text: str) -> Dict[str, Any]:
     
     t = (text or "").strip()
@@ -146,6 +536,7 @@ def _safe_json(text: str) -> Dict[str, Any]:
     try:
         return json.loads(t)
     except Exception:
+        llm_usage["json_parse_failures"] += 1
         return {}
 
 
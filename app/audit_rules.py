@@ -0,0 +1,122 @@
+import re
+from typing import Any, Dict, List, Optional
+
+# Guaranteed-return / no-risk phrasing. A match directly governed by a negation
+# ("not guaranteed", "no guarantee", "cannot be guaranteed") is fine; a negation
+# earlier in the clause or before punctuation ("no fee, guaranteed income") is not.
+_PROMISE = re.compile(
+    r"\b(guarantee[ds]?|risk[- ]free|no risk|zero risk|cannot lose|can't lose|assured returns?|"
+    r"certain to|sure to|will definitely|100% safe|always (?:profit|gain|outperform)s?)\b",
+    re.I,
+)
+_NEGATED = re.compile(
+    r"\b(?:not|no|never|without|cannot|can't|isn't|aren't|don't|doesn't|won't)(?:\s+(?:be|been|a|an|any))?\s+$",
+    re.I,
+)
+
+# Wording in the draft's reasoning that would make the product unsuitable for
+# the client it is written for (a riskier or less liquid product, one that
+# breaks a constraint): (applies to client, pattern, issue). Matches are
+# negation-checked like promises.
+_PROFILE_CONFLICTS = [
+    (
+        lambda c: int(c["risk_tolerance"]) <= 2,
+        re.compile(r"\b(?:high|aggressive|elevated)[- ]risk (?:tolerance|appetite|profile)|"
+                   r"\baggressive (?:investor|profile)|\bspeculative\b|"
+                   r"\bcomfortable with (?:high|significant|large) (?:risk|volatility|losses)", re.I),
+        "contradicts the client's low risk tolerance",
+    ),
+    (
+        lambda c: c.get("liquidity_need") == "High",
+        re.compile(r"\b(?:low|limited|minimal|little) (?:need for liquidity|liquidity needs?)|"
+                   r"\b(?:does not|doesn't) need (?:liquidity|quick access)|"
+                   r"\blong[- ](?:term )?lock-?ups? (?:suits|fits)", re.I),
+        "contradicts the client's high liquidity needs",
+    ),
+    (
+        lambda c: "No-derivatives" in c.get("constraints", []),
+        re.compile(r"\b(?:uses?|using|employs?|invests? in|exposure to|leverages?) derivatives\b", re.I),
+        "contradicts the client's No-derivatives constraint",
+    ),
+    (
+        lambda c: "ESG-only" in c.get("constraints", []),
+        re.compile(r"\b(?:non-ESG|not ESG|lacks? (?:an )?ESG)\b", re.I),
+        "contradicts the client's ESG-only constraint",
+    ),
+]
+
+_PLACEHOLDERS = {"", "n/a", "na", "none", "tbd", "-", "unknown"}
+_WORD = re.compile(r"[a-z][a-z\-]{4,}")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_STOP = {
+    "which", "their", "there", "these", "those", "about", "would", "could", "should", "while",
+    "client", "clients", "product", "market", "given", "within", "where", "being", "because",
+    "other", "under", "still", "might", "offers", "provides", "suitable",
+}
+
+
+def _unnegated(pattern: "re.Pattern[str]", text: str) -> List[str]:
+    return [m.group(0) for m in pattern.finditer(text) if not _NEGATED.search(text[: m.start()])]
+
+
+def _promises(text: str) -> List[str]:
+    return _unnegated(_PROMISE, text)
+
+
+def _profile_conflicts(client: Dict[str, Any], text: str) -> List[str]:
+    return [
+        f"'{phrase}' {issue}"
+        for applies, pattern, issue in _PROFILE_CONFLICTS if applies(client)
+        for phrase in _unnegated(pattern, text)
+    ]
+
+
+def pre_audit(
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    product: Dict[str, Any],
+    draft: Dict[str, Any],
+    evidence: List[Dict[str, str]],
+    min_support: float = 0.3,
+) -> Optional[Dict[str, Any]]:
+    """
+    Deterministic audit of a draft, with the same {is_ok, issues, revised}
+    shape as the LLM auditor:
+      - is_ok=True: every check passed, the LLM audit can be skipped
+      - is_ok=False: a check failed (issues say which); escalate to the LLM
+      - None: the draft's claims are not lexically grounded enough to decide
+    """
+    issues = []
+
+    text = " ".join([draft["why_client_fit"], draft["why_market_fit"], *draft["key_risks"],
+                     *draft["who_should_not_buy"]])
+    for phrase in _promises(text):
+        issues.append(f"Guaranteed-return language: '{phrase}'")
+
+    risks = [r.strip().lower() for r in draft["key_risks"]]
+    if not risks or any(r in _PLACEHOLDERS or r.startswith("insufficient structured output") for r in risks):
+        issues.append("Missing or placeholder risk disclosures")
+
+    # the product itself passed the suitability screen; check what the draft says about the client
+    claims = " ".join([draft["why_client_fit"], draft["why_market_fit"]])
+    for conflict in _profile_conflicts(client, claims):
+        issues.append(f"Suitability: {conflict}")
+
+    if issues:
+        return {"is_ok": False, "issues": issues, "revised": draft}
+
+    # every figure must appear in the sources, and enough of the content words
+    sources = " ".join(
+        [e.get("snippet", "") for e in evidence]
+        + [str(v) for v in product.values()]
+        + [str(v) for v in client.values()]
+        + [str(v) for v in market.values()]
+    ).lower()
+    claims = claims.lower()
+    if any(n not in sources for n in _NUMBER.findall(claims)):
+        return None
+    words = {w for w in _WORD.findall(claims) if w not in _STOP}
+    if words and sum(w in sources for w in words) / len(words) < min_support:
+        return None
+
+    return {"is_ok": True, "issues": [], "revised": draft}
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+import numpy as np
+
+from . import config
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+OPENAI_CHAT_MODEL = "gpt-4o-mini"
+OPENAI_TEMPERATURE = 0.2
+
+# "Label:\n<single-line JSON>" sections of the formatted prompts
+_SECTION = re.compile(r"^([^\n:]+):\n(.+)$", re.M)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def llm_identity() -> Tuple[str, float]:
+    """(model, temperature) of the configured chat backend, without creating it."""
+    if config.LLM_BACKEND == "simulated":
+        return SimulatedLLM.model_name, SimulatedLLM.temperature
+    return OPENAI_CHAT_MODEL, OPENAI_TEMPERATURE
+
+
+def _require_key() -> None:
+    if not config.OPENAI_API_KEY:
+        raise RuntimeError("Missing OPENAI_API_KEY in environment (.env).")
+
+
+def make_llm():
+    """Chat model for the agents, per config.LLM_BACKEND."""
+    if config.LLM_BACKEND == "simulated":
+        return SimulatedLLM(
+            latency_ms=config.SIM_LLM_LATENCY_MS,
+            jitter_ms=config.SIM_LLM_JITTER_MS,
+            failure_rate=config.SIM_LLM_FAILURE_RATE,
+            seed=config.SIM_SEED,
+        )
+    _require_key()
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model=OPENAI_CHAT_MODEL, temperature=OPENAI_TEMPERATURE, api_key=config.OPENAI_API_KEY)
+
+
+def make_embeddings() -> "Embeddings":
+    """Document/query embeddings for the vector index, per config.EMBEDDINGS_BACKEND."""
+    if config.EMBEDDINGS_BACKEND == "simulated":
+        return SimulatedEmbeddings(
+            size=config.SIM_EMBED_DIM,
+            latency_ms=config.SIM_EMBED_LATENCY_MS,
+            jitter_ms=config.SIM_EMBED_JITTER_MS,
+            failure_rate=config.SIM_EMBED_FAILURE_RATE,
+            seed=config.SIM_SEED,
+        )
+    _require_key()
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(api_key=config.OPENAI_API_KEY)
+
+
+def _delay(rng: random.Random, latency_ms: float, jitter_ms: float) -> float:
+    return max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+
+
+class SimulatedLLM:
+    """
+    Local stand-in for ChatOpenAI: sleeps latency ± jitter, fails with
+    probability failure_rate, and answers each prompt type with valid JSON
+    (drafts are agents.template_rationale over the prompt's own inputs;
+    audits pass). Usage metadata estimates ~4 characters per token.
+    """
+
+    model_name = "simulated"
+    temperature = 0.0
+
+    def __init__(self, latency_ms: float = 800, jitter_ms: float = 200, failure_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+
+    async def ainvoke(self, messages, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        await asyncio.sleep(_delay(self._rng, self.latency_ms, self.jitter_ms))
+        if self._rng.random() < self.failure_rate:
+            raise RuntimeError("simulated LLM failure")
+
+        prompt = "\n".join(m.content for m in messages)
+        content = json.dumps(self._answer(prompt), ensure_ascii=False)
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        )
+
+    def _answer(self, text: str) -> Dict[str, Any]:
+        from .agents import template_rationale
+        from .prompting import decode_evidence
+
+        sections = {label.strip(): body for label, body in _SECTION.findall(text)}
+
+        def field(prefix: str) -> Any:
+            for label, body in sections.items():
+                if label.startswith(prefix):
+                    return json.loads(body)
+            return {}
+
+        client, market = field("Client"), field("Market")
+        if "Audit EACH" in text:
+            return {"items": [
+                {"product_id": it["product_id"], "is_ok": True, "issues": [], "revised": {}}
+                for it in field("Products")
+            ]}
+        if any(k.startswith("Candidate products") for k in sections):
+            return {"items": [
+                dict(template_rationale(client, market, p, decode_evidence(p["evidence"])), product_id=p["product_id"])
+                for p in field("Candidate products")
+            ]}
+        if any(k.startswith("Draft") for k in sections):
+            return {"is_ok": True, "issues": [], "revised": field("Draft")}
+        return template_rationale(client, market, field("Candidate product"), decode_evidence(field("Evidence")))
+
+
+class SimulatedEmbeddings:
+    """
+    Local stand-in for OpenAIEmbeddings: hashed bag-of-words vectors
+    (texts sharing words end up close), with latency ± jitter per call
+    and a failure rate. Duck-typed like SimulatedLLM, so langchain stays
+    off the import path.
+    """
+
+    def __init__(self, size: int = 256, latency_ms: float = 20, jitter_ms: float = 5,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.size = size
+        self.model = f"simulated-{size}"
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+
+    def _call(self) -> None:
+        time.sleep(_delay(self._rng, self.latency_ms, self.jitter_ms))
+        if self._rng.random() < self.failure_rate:
+            raise RuntimeError("simulated embedding failure")
+
+    def _vector(self, text: str) -> List[float]:
+        v = np.zeros(self.size, dtype=np.float32)
+        for tok in _TOKEN.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(tok.encode(), digest_size=8).digest(), "little")
+            v[h % self.size] += 1.0 if (h >> 32) & 1 else -1.0
+        n = np.linalg.norm(v)
+        return (v / n if n else v).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._call()
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._call()
+        return self._vector(text)
@@ -0,0 +1,152 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def stable_hash(obj: Any) -> str:
+    """sha256 of a canonical JSON encoding (sorted keys)."""
+    blob = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class TTLCache:
+    """
+    In-memory LRU cache with size and TTL eviction.
+
+    If `path` is given, entries are also written to a SQLite file and the
+    newest `maxsize` live ones are loaded back when the cache is created, so
+    it survives restarts. Values must be JSON-serializable when a path is
+    used. Neither get() nor set() touches the disk: reads are served from
+    memory, and writes go through a queue to a writer thread with its own
+    connection, which commits them in batches; flush() waits for queued writes.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+
+        self._db = None
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        if path:
+            if maxsize < 1:
+                raise ValueError("a persistent TTLCache needs maxsize >= 1 (it serves reads from memory)")
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, stored_at REAL)"
+            )
+            self._prune_disk(self._db)
+            rows = self._db.execute(
+                "SELECT key, value, stored_at FROM entries WHERE stored_at >= ? ORDER BY stored_at",
+                (time.time() - ttl,),
+            ).fetchall()
+            for key, value, stored_at in rows:
+                self._put(key, json.loads(value), stored_at)
+            threading.Thread(target=self._writer, args=(path,), name="ttlcache-writer", daemon=True).start()
+            atexit.register(self.flush)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None and now - hit[0] <= self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            if hit is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def __contains__(self, key: str) -> bool:
+        """Live in memory; unlike get(), not counted as a hit or miss."""
+        with self._lock:
+            hit = self._data.get(key)
+            return hit is not None and time.time() - hit[0] <= self.ttl
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._put(key, value, now)
+        if self._db is not None:
+            self._queue.put((key, json.dumps(value, ensure_ascii=False), now))
+
+    def flush(self) -> None:
+        """Wait until every queued write is committed."""
+        if self._db is not None:
+            self._queue.join()
+
+    def clear(self) -> None:
+        self.flush()
+        with self._lock:
+            self._data.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "persistent": self._db is not None,
+        }
+
+    def _put(self, key: str, value: Any, stored_at: float) -> None:
+        self._data[key] = (stored_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _writer(self, path: str) -> None:
+        db = sqlite3.connect(path)
+        while True:
+            batch = [self._queue.get()]
+            while True:  # everything queued meanwhile goes in the same commit
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                db.executemany("INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)", batch)
+                self._writes += len(batch)
+                if self._writes >= self.maxsize:
+                    self._writes = 0
+                    self._prune_disk(db)
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning("Could not persist %d cache entries: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _prune_disk(self, db: sqlite3.Connection) -> None:
+        # drop expired rows, then keep only the newest `maxsize`
+        db.execute("DELETE FROM entries WHERE stored_at < ?", (time.time() - self.ttl,))
+        db.execute(
+            "DELETE FROM entries WHERE key NOT IN "
+            "(SELECT key FROM entries ORDER BY stored_at DESC LIMIT ?)",
+            (self.maxsize,),
+        )
+        db.commit()
@@ -0,0 +1,152 @@
+import bisect
+import csv
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+from .shared import MappedStrings, write_strings
+
+# Typed columns of opportunities.csv; anything else is kept as a string column.
+INT_COLUMNS = ("risk_level", "lockup_days")
+FLOAT_COLUMNS = ("fees",)
+BOOL_COLUMNS = ("derivatives_exposure", "esg")
+
+
+NUMERIC_COLUMNS = INT_COLUMNS + FLOAT_COLUMNS + BOOL_COLUMNS
+
+
+def _to_bool(v: Any) -> bool:
+    return str(v).strip().lower() == "true"
+
+
+class _SortedIds:
+    # ids[order[j]] for j in 0..n-1: the ids in sorted order, as a sequence bisect can search
+    def __init__(self, ids, order: np.ndarray):
+        self.ids, self.order = ids, order
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, j: int) -> str:
+        return self.ids[self.order[j]]
+
+
+class SortedPositions:
+    """
+    product_id -> row lookup over memory-mapped columns: binary search in
+    the ids' sort order instead of a per-process dict. Same answers as the
+    dict (the last row wins for a duplicated id).
+    """
+
+    def __init__(self, ids, order: np.ndarray):
+        self._keys = _SortedIds(ids, order)
+
+    def get(self, pid: str, default: Optional[int] = None) -> Optional[int]:
+        j = bisect.bisect_right(self._keys, pid) - 1
+        return int(self._keys.order[j]) if j >= 0 and self._keys[j] == pid else default
+
+    def __contains__(self, pid: str) -> bool:
+        return self.get(pid) is not None
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """
+    Array-backed product catalog: one numpy array per column.
+    Row dicts (same shape as pandas `to_dict(orient="records")`) are built
+    only for the products that actually need them (prompts, responses).
+
+    save() writes the columns to a directory and open() maps them back
+    read-only, so worker processes on one host share a single copy: string
+    columns are then MappedStrings and `position` a SortedPositions.
+    """
+    columns: List[str]
+    product_id: np.ndarray
+    name: np.ndarray
+    risk_level: np.ndarray
+    lockup_days: np.ndarray
+    fees: np.ndarray
+    derivatives_exposure: np.ndarray
+    esg: np.ndarray
+    extra: Dict[str, Any] = field(default_factory=dict)
+    position: Mapping[str, int] = field(default_factory=dict)  # product_id -> row
+
+    def __len__(self) -> int:
+        return len(self.product_id)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "Catalog":
+        records = list(records)
+        columns = list(records[0].keys()) if records else ["product_id", "name"]
+        typed = {"product_id", "name", *INT_COLUMNS, *FLOAT_COLUMNS, *BOOL_COLUMNS}
+
+        def col(name, conv, dtype, default):
+            return np.array([conv(r.get(name, default)) for r in records], dtype=dtype)
+
+        product_id = col("product_id", str, object, "")
+        return cls(
+            columns=columns,
+            product_id=product_id,
+            name=col("name", str, object, ""),
+            risk_level=col("risk_level", int, np.int64, 0),
+            lockup_days=col("lockup_days", int, np.int64, 0),
+            fees=col("fees", float, np.float64, 0.0),
+            derivatives_exposure=col("derivatives_exposure", _to_bool, bool, "false"),
+            esg=col("esg", _to_bool, bool, "false"),
+            extra={c: col(c, str, object, "") for c in columns if c not in typed},
+            position={pid: i for i, pid in enumerate(product_id)},
+        )
+
+    @classmethod
+    def from_csv(cls, path: str) -> "Catalog":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return cls.from_records(csv.DictReader(f))
+
+    def save(self, path: str) -> None:
+        """Numeric columns as .npy, string columns as UTF-8 blobs + offsets, plus the id sort order."""
+        os.makedirs(path, exist_ok=True)
+        for c in NUMERIC_COLUMNS:
+            np.save(os.path.join(path, f"{c}.npy"), getattr(self, c))
+        strings = {"product_id": self.product_id, "name": self.name, **self.extra}
+        for c, col in strings.items():
+            offsets = write_strings(os.path.join(path, f"{c}.txt"), (col[i] for i in range(len(self))))
+            np.save(os.path.join(path, f"{c}.offsets.npy"), offsets)
+        ids = [self.product_id[i] for i in range(len(self))]
+        np.save(os.path.join(path, "order.npy"), np.asarray(sorted(range(len(ids)), key=ids.__getitem__), np.int64))
+        with open(os.path.join(path, "catalog.json"), "w", encoding="utf-8") as f:
+            json.dump({"columns": self.columns, "extra": list(self.extra)}, f)
+
+    @classmethod
+    def open(cls, path: str) -> "Catalog":
+        """Map a catalog written by save(); nothing is copied into this process."""
+        with open(os.path.join(path, "catalog.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        def strings(c):
+            return MappedStrings(os.path.join(path, f"{c}.txt"), array(f"{c}.offsets"))
+
+        def array(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        product_id = strings("product_id")
+        return cls(
+            columns=meta["columns"],
+            product_id=product_id,
+            name=strings("name"),
+            **{c: array(c) for c in NUMERIC_COLUMNS},
+            extra={c: strings(c) for c in meta["extra"]},
+            position=SortedPositions(product_id, array("order")),
+        )
+
+    def row(self, i: int) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for c in self.columns:
+            v = self.extra[c][i] if c in self.extra else getattr(self, c)[i]
+            out[c] = v.item() if isinstance(v, np.generic) else v
+        return out
+
+    def rows(self, idx: Iterable[int]) -> List[Dict[str, Any]]:
+        return [self.row(int(i)) for i in idx]
@@ -3,6 +3,82 @@ import os
 
 load_dotenv()
 
+# "openai", or "simulated" for local stand-ins (benchmarks, offline runs; see app/backends.py).
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "openai")
+
+# Checked when an OpenAI backend is first created, not at import.
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Missing OPENAI_API_KEY in environment (.env).")
+
+# Simulated backends: per-call latency ± uniform jitter, and failure probability.
+SIM_LLM_LATENCY_MS = float(os.getenv("SIM_LLM_LATENCY_MS", "800"))
+SIM_LLM_JITTER_MS = float(os.getenv("SIM_LLM_JITTER_MS", "200"))
+SIM_LLM_FAILURE_RATE = float(os.getenv("SIM_LLM_FAILURE_RATE", "0"))
+SIM_EMBED_LATENCY_MS = float(os.getenv("SIM_EMBED_LATENCY_MS", "20"))
+SIM_EMBED_JITTER_MS = float(os.getenv("SIM_EMBED_JITTER_MS", "5"))
+SIM_EMBED_FAILURE_RATE = float(os.getenv("SIM_EMBED_FAILURE_RATE", "0"))
+SIM_EMBED_DIM = int(os.getenv("SIM_EMBED_DIM", "256"))
+SIM_SEED = int(os.getenv("SIM_SEED", "0"))
+
+# Max LLM calls in flight across the whole process (all requests).
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Max per-product retrieve -> recommend -> audit chains in flight per request.
+REQUEST_MAX_CONCURRENCY = int(os.getenv("REQUEST_MAX_CONCURRENCY", "4"))
+# Max per-product chains in flight per /recommend/batch call (all items together).
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+# Draft (and audit) all selected products of a request in one multi-product LLM call.
+BATCHED_PROMPTS = os.getenv("BATCHED_PROMPTS", "false").lower() == "true"
+# Pick the final top_k from base_scores first and only explain those.
+RANK_THEN_EXPLAIN = os.getenv("RANK_THEN_EXPLAIN", "true").lower() == "true"
+# Concurrent requests needing identical retrieval / draft+audit work (same inputs up
+# to client_id) await one shared computation instead of each running it.
+COALESCE_INFLIGHT = os.getenv("COALESCE_INFLIGHT", "true").lower() == "true"
+
+# Max input tokens per LLM call (estimated at ~4 characters per token); the
+# lowest-ranked evidence snippets are dropped to fit. 0 = no budget.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+
+# Cache of final (post-audit) rationales. Empty path = in-memory only.
+RATIONALE_CACHE_SIZE = int(os.getenv("RATIONALE_CACHE_SIZE", "4096"))
+RATIONALE_CACHE_TTL_S = float(os.getenv("RATIONALE_CACHE_TTL_S", "86400"))
+RATIONALE_CACHE_PATH = os.getenv("RATIONALE_CACHE_PATH", "")
+
+# Formatted rejection lists kept per worker, by suitability profile (LRU). Each can
+# hold a {product_id, reason} dict per catalog row, so keep this small.
+REJECTION_CACHE_PROFILES = int(os.getenv("REJECTION_CACHE_PROFILES", "4"))
+
+# Memoized query embeddings / retrieval results (entries each).
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "20000"))
+# Precompute retrieval for every product x market regime x client bucket at startup.
+RETRIEVAL_WARMUP = os.getenv("RETRIEVAL_WARMUP", "false").lower() == "true"
+# Evidence ranking: "vector" (embeds each query), "bm25" (in-process lexical index,
+# no embedding call per query) or "hybrid" (BM25 + cached query embeddings).
+RETRIEVER = os.getenv("RETRIEVER", "vector").lower()
+# Weight of the vector score in hybrid mode (BM25 gets the rest).
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.5"))
+# Product catalog CSV (default: data/opportunities.csv) and vector index directory (default: data/faiss_index).
+CATALOG_PATH = os.getenv("CATALOG_PATH", "")
+INDEX_DIR = os.getenv("INDEX_DIR", "")
+# Directory (e.g. /dev/shm/reco) where the first worker on a host publishes the parsed
+# catalog + eligibility index as memory-mapped files for the others; empty = per process.
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", "")
+# Ranked shortlist length precomputed per market regime x suitability profile when a
+# catalog loads; requests needing up to this many candidates skip scoring. 0 disables.
+RANK_PRECOMPUTE_DEPTH = int(os.getenv("RANK_PRECOMPUTE_DEPTH", "60"))
+# Poll the catalog CSV this often (seconds) and hot-swap the catalog when it changes; 0 disables.
+CATALOG_WATCH_INTERVAL_S = float(os.getenv("CATALOG_WATCH_INTERVAL_S", "2"))
+
+# Rule-based pre-audit; the LLM audit only runs on drafts it flags or cannot decide.
+LOCAL_PRE_AUDIT = os.getenv("LOCAL_PRE_AUDIT", "true").lower() == "true"
+# Min share of a draft's content words found in evidence/product/client/market text.
+PRE_AUDIT_MIN_SUPPORT = float(os.getenv("PRE_AUDIT_MIN_SUPPORT", "0.3"))
+
+# Per-request latency budget for /recommend and /recommend/stream (0 = none).
+# Items still unfinished when it runs out get a template rationale, marked degraded.
+REQUEST_BUDGET_MS = int(os.getenv("REQUEST_BUDGET_MS", "20000"))
+
+# Per-stage timers, HTTP histograms and /metrics (Prometheus text format).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Add a Server-Timing header with the per-stage breakdown to every response
+# (otherwise only to requests sending `X-Debug-Timing: 1`). Needs METRICS_ENABLED.
+TIMING_HEADER = os.getenv("TIMING_HEADER", "false").lower() == "true"
@@ -0,0 +1,62 @@
+import re
+from collections import Counter
+from typing import Dict, Sequence
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str):
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk texts, held as a chunk x term sparse matrix
+    (CSR: per chunk, sorted term ids and their counts). Scoring a query
+    against a set of chunk positions touches only those chunks' rows, so a
+    product-scoped search costs the same however large the corpus is.
+    """
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        rows, terms, tfs = [], [], []
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for i in range(len(texts)):
+            tokens = tokenize(texts[i])
+            lengths[i] = len(tokens)
+            for tok, n in Counter(tokens).items():
+                rows.append(i)
+                terms.append(self.vocab.setdefault(tok, len(self.vocab)))
+                tfs.append(n)
+        rows, terms = np.asarray(rows, dtype=np.int64), np.asarray(terms, dtype=np.int32)
+        order = np.lexsort((terms, rows))
+        self.indices = terms[order]
+        self.data = np.asarray(tfs, dtype=np.float32)[order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(texts)))])
+        df = np.bincount(self.indices, minlength=len(self.vocab))
+        n = len(texts)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        # per-chunk length normalization, k1 * (1 - b + b * len / avg len)
+        self.norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()) if n else 0.0, 1.0))
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def scores(self, query: str, pos: np.ndarray) -> np.ndarray:
+        """BM25 score of query for each chunk position in pos (0 where no term matches)."""
+        qterms = np.unique([self.vocab[t] for t in tokenize(query) if t in self.vocab]).astype(np.int32)
+        if not len(qterms) or not len(pos):
+            return np.zeros(len(pos), dtype=np.float32)
+        starts, lens = self.indptr[pos], self.indptr[pos + 1] - self.indptr[pos]
+        # positions of every nonzero of the selected rows, and which row each belongs to
+        owner = np.repeat(np.arange(len(pos)), lens)
+        flat = np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens) + np.repeat(starts, lens)
+        hit = np.isin(self.indices[flat], qterms)
+        flat, owner = flat[hit], owner[hit]
+        tf = self.data[flat]
+        w = self.idf[self.indices[flat]] * tf * (self.k1 + 1) / (tf + self.norm[pos[owner]])
+        return np.bincount(owner, weights=w, minlength=len(pos)).astype(np.float32)
@@ -1,100 +1,650 @@
+import asyncio
+import dataclasses
+import functools
+import json
+import logging
 import os
-import pandas as pd
-from fastapi import FastAPI
-from typing import List, Dict, Any
+import time
 
-from .schemas import RecommendRequest, RecommendResponse, RecommendationItem, Evidence
-from .rules import suitability_filter
-from .market import market_preferences
-from .rag import build_or_load_vectorstore, retrieve_evidence
-from .agents import recommend_one, audit_one
+_t_import = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Awaitable, Callable, List, Dict, Any, Hashable, Literal, Optional
+
+from .schemas import (
+    RecommendRequest, RecommendResponse, RecommendationItem, Evidence,
+    ScoredCandidate, ExplainRequest, ExplainResponse, BatchRecommendRequest,
+)
+from .rules import profile_key
+from .snapshot import CatalogSnapshot, empty_snapshot, file_stamp, load_snapshot
+from .scoring import base_scores, rank, top_ranked
+from .market import market_preferences, market_regimes
+from .ranking import weights_key
+from .singleflight import SingleFlight
+from .rag import (
+    build_or_load_vectorstore, build_query, retrieve_evidence, warm_up,
+    query_embedding_cache, retrieval_cache,
+)
+from .agents import (
+    explain_one, explain_many, fallback_rationale, template_rationale, rationale_cache, rationale_key,
+    llm_usage, audit_summary, audit_stats, prepare as prepare_agents,
+)
+from . import config, metrics
+from .metrics import stage
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
-OPP_CSV = os.path.join(DATA_DIR, "opportunities.csv")
+OPP_CSV = config.CATALOG_PATH or os.path.join(DATA_DIR, "opportunities.csv")
+CLIENTS_JSON = os.path.join(DATA_DIR, "clients.json")
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Market-aware Investment Opportunity Matching System")
 
-# Load once at startup
+# Vector index: loaded in the background by startup (see _warm_up)
 vectorstore = None
-opportunities: List[Dict[str, Any]] = []
+# Active catalog snapshot. Only ever replaced, never mutated: a request reads
+# this once and passes its snapshot down, so a reload cannot change it mid-way.
+snapshot: CatalogSnapshot = empty_snapshot()
+_reload_lock = asyncio.Lock()
+
+def load_catalog(path: Optional[str] = None) -> CatalogSnapshot:
+    """Build a snapshot of path (default OPP_CSV) and swap it in with a single assignment."""
+    global snapshot
+    snapshot = load_snapshot(path or OPP_CSV)
+    return snapshot
+
+async def reload_catalog(path: Optional[str] = None):
+    """
+    Rebuild the snapshot from path (default: the active one's file) in a
+    thread and swap it in. Returns (previous, active) snapshots. Reloads are
+    serialized; on error the active snapshot is kept and the error raised.
+    """
+    global snapshot
+    async with _reload_lock:
+        old = snapshot
+        try:
+            new = await asyncio.to_thread(load_snapshot, path or old.path or OPP_CSV)
+        except Exception:
+            metrics.inc("reco_catalog_reloads_total", outcome="failed")
+            logger.exception("Catalog reload failed, keeping version %s", old.version)
+            raise
+        if new.version == old.version and new.path == old.path:
+            # same bytes (file touched/rewritten): keep the old index and its caches
+            snapshot = dataclasses.replace(old, mtime_ns=new.mtime_ns, size=new.size)
+            metrics.inc("reco_catalog_reloads_total", outcome="unchanged")
+            return old, snapshot
+        snapshot = new
+        metrics.inc("reco_catalog_reloads_total", outcome="swapped")
+        logger.info("Catalog %s -> %s (%d products, %.0f ms)", old.version, new.version, len(new.catalog), new.load_ms)
+    if config.RETRIEVAL_WARMUP and vectorstore is not None:
+        _background(asyncio.to_thread(_warm_retrieval, new))
+    return old, new
+
+async def _watch_catalog() -> None:
+    """Poll the active snapshot's file and reload when its mtime/size changes."""
+    failed = None  # stamp of a file that failed to load; retried once it changes again
+    while True:
+        await asyncio.sleep(config.CATALOG_WATCH_INTERVAL_S)
+        snap = snapshot
+        try:
+            stamp = file_stamp(snap.path)
+        except OSError:
+            continue  # missing mid-replace; keep serving the active snapshot
+        if stamp == (snap.mtime_ns, snap.size) or stamp == failed:
+            continue
+        try:
+            await reload_catalog()
+            failed = None
+        except Exception:
+            failed = stamp
+
+# strong references to fire-and-forget tasks (the loop only keeps weak ones)
+_tasks: set = set()
+
+def _background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+# Startup progress for /ready. Each step: pending -> loading -> ready | failed.
+readiness: Dict[str, Any] = {
+    "catalog": "pending",
+    "index": "pending",
+    "agents": "pending",
+    "warmup": "pending" if config.RETRIEVAL_WARMUP else "skipped",
+    "error": None,
+    "import_ms": None,
+    "ready_ms": None,
+}
+# set once the vector index has loaded (or failed to); _retrieve waits on it
+_index_ready = asyncio.Event()
 
 @app.on_event("startup")
-def startup():
-    global vectorstore, opportunities
-    vectorstore = build_or_load_vectorstore()
-    df = pd.read_csv(OPP_CSV)
-    opportunities = df.to_dict(orient="records")
+async def startup():
+    """
+    Load the catalog (small, no network) before serving, then load/build the
+    vector index and LLM client in the background so the port opens at once.
+    """
+    t0 = time.perf_counter()
+    load_catalog()
+    readiness["catalog"] = "ready"
+    _background(_warm_up(t0))
+    if config.CATALOG_WATCH_INTERVAL_S > 0:
+        _background(_watch_catalog())
+
+async def _step(name: str, fn: Callable[[], Any]) -> Any:
+    readiness[name] = "loading"
+    try:
+        out = await asyncio.to_thread(fn)
+    except Exception as e:
+        readiness[name] = "failed"
+        readiness["error"] = f"{name}: {e}"
+        logger.exception("Startup step %r failed", name)
+        raise
+    readiness[name] = "ready"
+    return out
+
+async def _warm_up(t0: float) -> None:
+    global vectorstore
+    # _step has logged and recorded a failure; the index is used even if the agents step failed
+    index, agents = await asyncio.gather(
+        _step("index", build_or_load_vectorstore), _step("agents", prepare_agents), return_exceptions=True
+    )
+    if not isinstance(index, BaseException):
+        vectorstore = index
+    _index_ready.set()
+    if isinstance(index, BaseException) or isinstance(agents, BaseException):
+        return
+    if config.RETRIEVAL_WARMUP:
+        try:
+            await _step("warmup", lambda: _warm_retrieval(snapshot))
+        except Exception:
+            return
+    readiness["ready_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    logger.info("Ready in %.0f ms (import %.0f ms)", readiness["ready_ms"], readiness["import_ms"])
+
+def _warm_retrieval(snap: CatalogSnapshot) -> None:
+    # every market regime x the client buckets seen in clients.json
+    with open(CLIENTS_JSON, "r", encoding="utf-8") as f:
+        clients = json.load(f)
+    n = warm_up(vectorstore, snap.catalog.rows(range(len(snap.catalog))), market_regimes(), clients)
+    logger.info("Warmed %d retrieval queries", n)
 
-def base_score(client: Dict[str, Any], product: Dict[str, Any], mweights: Dict[str, float]) -> float:
-    
-    score = 50.0
+class _Shared:
+    """
+    Work shared across the items of one batch: each distinct key is computed
+    once and every item asking for it awaits the same task.
+    """
 
-    
-    risk_gap = client["risk_tolerance"] - int(product["risk_level"])
-    score += max(0, 10 - abs(risk_gap) * 3)
+    def __init__(self):
+        self.tasks: Dict[Hashable, asyncio.Future] = {}
+        self.ranks: Dict[Hashable, Any] = {}
 
-    # market weights
-    if mweights["prefer_low_risk"] > 0:
-        score += (6 - int(product["risk_level"])) * mweights["prefer_low_risk"] * 2
+    async def once(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.tasks.get(key)
+        if task is None:
+            task = self.tasks[key] = asyncio.ensure_future(fn())
+        # shield: one cancelled item must not cancel the shared task
+        return await asyncio.shield(task)
 
-    if mweights["penalize_derivatives"] > 0 and str(product.get("derivatives_exposure", "false")).lower() == "true":
-        score -= 20 * mweights["penalize_derivatives"]
+    def cancel(self) -> None:
+        for task in self.tasks.values():
+            task.cancel()
 
-    if mweights["prefer_short_lockup"] > 0:
-        score += max(0, 14 - int(product["lockup_days"])) * mweights["prefer_short_lockup"] * 0.4
+# identical retrieval / LLM work in flight for any request, keyed without client_id
+inflight = SingleFlight()
+
+async def _once(shared: Optional[_Shared], key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    fn() once per key across the items of a batch (shared) and, with
+    config.COALESCE_INFLIGHT, across all concurrent requests.
+    """
+    if config.COALESCE_INFLIGHT:
+        fn = functools.partial(inflight.do, key, fn)
+    return await (shared.once(key, fn) if shared is not None else fn())
+
+def _rank(
+    snap: CatalogSnapshot,
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    shared: Optional[_Shared] = None,
+    depth: Optional[int] = None,
+):
+    """
+    Deterministic part of the pipeline: suitability screen + base_scores sort.
+    Returns (ranked, scores, rejected): ranked catalog rows by score desc
+    (at least the first `depth`, all eligible rows if None), their scores,
+    and the {product_id, reason} rejections.
+    """
+    mweights = market_preferences(market)
 
-    # fees penalty
-    score -= float(product["fees"]) * 1000 
-    return float(score)
+    # depends only on the constraint profile and the market weights
+    pkey = profile_key(client)
+    key = (pkey, weights_key(mweights), depth)
+    if shared is not None and key in shared.ranks:
+        return shared.ranks[key]
+
+    # labelled market regimes: the shortlist was ranked when the snapshot loaded
+    precomputed = snap.ranks.lookup(mweights, pkey, depth) if depth is not None else None
+    metrics.inc("reco_rank_lookups_total", source="live" if precomputed is None else "precomputed")
+
+    with stage("suitability"):
+        if precomputed is None:
+            eligible_idx, _ = snap.eligibility.lookup(client)
+        rejected = snap.eligibility.rejected(client)
+
+    if precomputed is not None:
+        out = (*precomputed, rejected)
+    else:
+        # baseline scoring + sort (only the top `depth` when that is all the caller needs)
+        with stage("scoring"):
+            scores = base_scores(client, snap.catalog, mweights, eligible_idx)
+            order = rank(scores) if depth is None else top_ranked(scores, depth)
+        out = eligible_idx[order], scores[order], rejected
+    if shared is not None:
+        shared.ranks[key] = out
+    return out
+
+def _candidates(snap: CatalogSnapshot, ranked, scores, n: int):
+    """(score, product row) pairs for the first n ranked rows."""
+    return [(float(s), snap.catalog.row(int(i))) for s, i in zip(scores[:n], ranked[:n])]
 
 @app.post("/recommend", response_model=RecommendResponse)
 async def recommend(req: RecommendRequest):
+    slots = asyncio.Semaphore(config.REQUEST_MAX_CONCURRENCY)
+    return await _recommend(req, slots, snapshot, deadline=_deadline(req))
+
+def _deadline(req: RecommendRequest, default_ms: Optional[int] = None) -> Optional[float]:
+    """Monotonic time the request's LLM work must finish by; None = no budget."""
+    if default_ms is None:
+        default_ms = config.REQUEST_BUDGET_MS
+    budget_ms = req.budget_ms if req.budget_ms is not None else default_ms
+    return time.monotonic() + budget_ms / 1000 if budget_ms else None
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+@app.post("/recommend/batch")
+async def recommend_batch(req: BatchRecommendRequest):
+    """
+    Run many /recommend requests, sharing ranking, retrieval and identical
+    LLM work across the batch. Streams one NDJSON line per item as it
+    finishes: {"index": i, "response": {...}} or {"index": i, "error": "..."}.
+    Items share one concurrency pool, so only an explicit item budget_ms
+    applies here, not config.REQUEST_BUDGET_MS. All items use the catalog
+    snapshot active when the batch started.
+    """
+    slots = asyncio.Semaphore(req.max_concurrency or config.BATCH_MAX_CONCURRENCY)
+    shared = _Shared()
+    snap = snapshot
+
+    async def run(i: int, item: RecommendRequest):
+        try:
+            resp = await _recommend(item, slots, snap, shared, _deadline(item, 0))
+            return {"index": i, "response": resp.model_dump()}
+        except Exception as e:
+            logger.exception("Batch item %d failed", i)
+            return {"index": i, "error": str(e)}
+
+    async def lines():
+        tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(req.items)]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps(await done, ensure_ascii=False) + "\n"
+        finally:
+            # client went away or we are done: drop anything still running
+            for t in tasks:
+                t.cancel()
+            shared.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _plan(req: RecommendRequest, snap: CatalogSnapshot, shared: Optional[_Shared] = None):
+    """
+    Everything before the LLM: returns (client, market, rejected, shortlist,
+    to_explain), the last two as (score, product row) pairs.
+    """
     client = req.client.model_dump()
     market = req.market.model_dump()
 
-    eligible, rejected = suitability_filter(client, opportunities)
-    if not eligible:
-        return RecommendResponse(recommendations=[], rejected=rejected)
+    n = max(req.top_k * 3, 6)
+    ranked, scores, rejected = _rank(snap, client, market, shared, depth=n)
+    shortlist = _candidates(snap, ranked, scores, n)
 
-    mweights = market_preferences(market)
+    # score comes only from base_scores, so the final top_k is already known;
+    # rank-then-explain skips the LLM calls for items that would be cut anyway.
+    rank_first = config.RANK_THEN_EXPLAIN if req.rank_then_explain is None else req.rank_then_explain
+    to_explain = shortlist[: req.top_k] if rank_first else shortlist
+    return client, market, rejected, shortlist, to_explain
+
+def _response(
+    req: RecommendRequest, snap: CatalogSnapshot, rec_items: List[RecommendationItem], rejected, shortlist
+) -> RecommendResponse:
+    with stage("response"):
+        # final top_k
+        rec_items = sorted(rec_items, key=lambda x: x.score, reverse=True)
 
-    # baseline scoring + sort
-    scored = []
-    for p in eligible:
-        s = base_score(client, p, mweights)
-        scored.append((s, p))
-    scored.sort(key=lambda x: x[0], reverse=True)
+        extra: List[ScoredCandidate] = []
+        if req.include_shortlist:
+            extra = [
+                ScoredCandidate(product_id=p["product_id"], name=p["name"], score=float(s))
+                for s, p in shortlist[req.top_k:]
+            ]
+        return RecommendResponse(
+            recommendations=rec_items[: req.top_k], rejected=rejected, shortlist=extra,
+            catalog_version=snap.version,
+        )
 
-    
-    shortlist = scored[: max(req.top_k * 3, 6)]
+async def _recommend(
+    req: RecommendRequest,
+    slots: asyncio.Semaphore,
+    snap: CatalogSnapshot,
+    shared: Optional[_Shared] = None,
+    deadline: Optional[float] = None,
+) -> RecommendResponse:
+    client, market, rejected, shortlist, to_explain = _plan(req, snap, shared)
 
     rec_items: List[RecommendationItem] = []
-    for s, p in shortlist:
-        query = f"Client goal={client['goal']}, horizon={client['horizon_months']} months, " \
-                f"risk={client['risk_tolerance']}. Market rate={market['interest_rate_trend']}, vol={market['volatility_level']}."
-        evidence = retrieve_evidence(vectorstore, query + " " + p["name"], k=4)
-
-        draft = await recommend_one(client, market, p, evidence)
-        audit = await audit_one(client, market, p, draft, evidence)
-
-        final = audit["revised"] if not audit.get("is_ok", True) else draft
-
-        item = RecommendationItem(
-            product_id=p["product_id"],
-            name=p["name"],
-            score=float(s),
-            why_client_fit=final["why_client_fit"],
-            why_market_fit=final["why_market_fit"],
-            key_risks=final["key_risks"],
-            who_should_not_buy=final["who_should_not_buy"],
-            evidence=[Evidence(**e) for e in evidence],
+    if config.BATCHED_PROMPTS and len(to_explain) > 1:
+        try:
+            rec_items = await _explain_batched(client, market, to_explain, slots, shared, deadline)
+        except Exception:
+            logger.exception("Batched explain failed, falling back to per-product calls")
+    if not rec_items:
+        rec_items = list(
+            await asyncio.gather(*(
+                _explain(client, market, s, p, slots, shared, deadline) for s, p in to_explain
+            ))
         )
-        rec_items.append(item)
+    return _response(req, snap, rec_items, rejected, shortlist)
 
-    # final top_k
-    rec_items.sort(key=lambda x: x.score, reverse=True)
-    return RecommendResponse(recommendations=rec_items[: req.top_k], rejected=rejected)
+@app.post("/recommend/stream")
+async def recommend_stream(req: RecommendRequest, format: Literal["sse", "ndjson"] = "sse"):
+    """
+    Streaming /recommend. Events, in order:
+      ranked  - {rejected, candidates, catalog_version}: suitability result and
+                scored shortlist, sent before any LLM call
+      item    - one RecommendationItem per explained product, as each completes
+      summary - {recommendations: ordered product_ids, shortlist, catalog_version, elapsed_ms}
+    format=sse sends `event:`/`data:` frames; format=ndjson sends {"event", "data"} lines.
+    """
+    t0 = time.perf_counter()
+    deadline = _deadline(req)
+    snap = snapshot
+
+    def frame(event: str, data: Any) -> str:
+        if format == "sse":
+            return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        return json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+
+    async def events():
+        client, market, rejected, shortlist, to_explain = _plan(req, snap)
+        yield frame("ranked", {
+            "rejected": rejected,
+            "candidates": [
+                {"product_id": p["product_id"], "name": p["name"], "score": float(s)}
+                for s, p in shortlist
+            ],
+            "catalog_version": snap.version,
+        })
+
+        slots = asyncio.Semaphore(config.REQUEST_MAX_CONCURRENCY)
+        tasks = [
+            asyncio.ensure_future(_explain(client, market, s, p, slots, deadline=deadline))
+            for s, p in to_explain
+        ]
+        rec_items: List[RecommendationItem] = []
+        try:
+            for done in asyncio.as_completed(tasks):
+                item = await done
+                rec_items.append(item)
+                yield frame("item", item.model_dump())
+        finally:
+            for t in tasks:
+                t.cancel()
+
+        final = _response(req, snap, rec_items, rejected, shortlist)
+        yield frame("summary", {
+            "recommendations": [r.product_id for r in final.recommendations],
+            "shortlist": [c.model_dump() for c in final.shortlist],
+            "catalog_version": snap.version,
+            "elapsed_ms": (time.perf_counter() - t0) * 1000,
+        })
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
+
+@app.post("/recommend/explain", response_model=ExplainResponse)
+async def explain(req: ExplainRequest):
+    """
+    Expand selected shortlist entries into full explained recommendations.
+    """
+    client = req.client.model_dump()
+    market = req.market.model_dump()
+    snap = snapshot
+
+    ranked, scores, _ = _rank(snap, client, market)
+    score_of = dict(zip(ranked.tolist(), scores.tolist()))
+    rows = {pid: snap.catalog.position.get(pid) for pid in req.product_ids}
+    wanted = [(score_of[i], snap.catalog.row(i)) for i in rows.values() if i in score_of]
+    not_eligible = [pid for pid, i in rows.items() if i not in score_of]
+
+    slots = asyncio.Semaphore(config.REQUEST_MAX_CONCURRENCY)
+    rec_items = list(
+        await asyncio.gather(*(_explain(client, market, s, p, slots) for s, p in wanted))
+    )
+    return ExplainResponse(recommendations=rec_items, not_eligible=not_eligible, catalog_version=snap.version)
+
+async def _retrieve(client, market, p, shared: Optional[_Shared] = None) -> List[Dict[str, str]]:
+    if vectorstore is None:
+        # still loading in the background; the request budget bounds the wait
+        await _index_ready.wait()
+    query = build_query(client, market, p)
+    with stage("retrieve"):
+        return await _once(
+            shared, ("retrieve", query, p["product_id"]),
+            lambda: asyncio.to_thread(retrieve_evidence, vectorstore, query, 4, p["product_id"]),
+        )
+
+async def _explain_batched(
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    to_explain,
+    slots: asyncio.Semaphore,
+    shared: Optional[_Shared] = None,
+    deadline: Optional[float] = None,
+) -> List[RecommendationItem]:
+    """
+    Like _explain for every product, but drafts and audits all of them
+    with one multi-product LLM call each (agents.explain_many).
+    """
+    products = [p for _, p in to_explain]
+    evidences: List[List[Dict[str, str]]] = [[] for _ in products]
+
+    async def chain():
+        async with slots:
+            evidences[:] = await asyncio.gather(*(_retrieve(client, market, p, shared) for p in products))
+            keys = tuple(rationale_key(client, market, p, ev) for p, ev in zip(products, evidences))
+            return await _once(
+                shared, ("explain_many", keys),
+                lambda: explain_many(client, market, products, evidences),
+            )
+
+    try:
+        finals = await asyncio.wait_for(chain(), _remaining(deadline))
+    except asyncio.TimeoutError:
+        logger.warning("Latency budget exhausted for %d products, using template rationales", len(products))
+        metrics.inc("reco_degraded_items_total", len(products), reason="budget")
+        return [
+            _item(s, p, template_rationale(client, market, p, ev), ev, degraded=True)
+            for (s, p), ev in zip(to_explain, evidences)
+        ]
+    return [_item(s, p, final, ev) for (s, p), final, ev in zip(to_explain, finals, evidences)]
+
+def _item(
+    score: float,
+    p: Dict[str, Any],
+    final: Dict[str, Any],
+    evidence: List[Dict[str, str]],
+    degraded: bool = False,
+) -> RecommendationItem:
+    return RecommendationItem(
+        product_id=p["product_id"],
+        name=p["name"],
+        score=float(score),
+        why_client_fit=final["why_client_fit"],
+        why_market_fit=final["why_market_fit"],
+        key_risks=final["key_risks"],
+        who_should_not_buy=final["who_should_not_buy"],
+        evidence=[Evidence(**e) for e in evidence],
+        degraded=degraded,
+    )
+
+async def _explain(
+    client: Dict[str, Any],
+    market: Dict[str, Any],
+    score: float,
+    p: Dict[str, Any],
+    slots: asyncio.Semaphore,
+    shared: Optional[_Shared] = None,
+    deadline: Optional[float] = None,
+) -> RecommendationItem:
+    """
+    Run retrieve -> recommend -> audit for ONE shortlisted product.
+    A failure only degrades this item to the fallback rationale; running
+    out of budget (queueing included) degrades it to the template rationale.
+    """
+    evidence: List[Dict[str, str]] = []
+
+    async def chain():
+        nonlocal evidence
+        async with slots:
+            evidence = await _retrieve(client, market, p, shared)
+            return await _once(
+                shared, ("explain", rationale_key(client, market, p, evidence)),
+                lambda: explain_one(client, market, p, evidence),
+            )
+
+    degraded = True
+    try:
+        final = await asyncio.wait_for(chain(), _remaining(deadline))
+        degraded = False
+    except asyncio.TimeoutError:
+        logger.warning("Latency budget exhausted for %s, using template rationale", p["product_id"])
+        metrics.inc("reco_degraded_items_total", reason="budget")
+        final = template_rationale(client, market, p, evidence)
+    except Exception:
+        logger.exception("Recommendation chain failed for %s", p["product_id"])
+        metrics.inc("reco_degraded_items_total", reason="error")
+        final = fallback_rationale()
+    return _item(score, p, final, evidence, degraded)
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "rationale": rationale_cache.stats(),
+        "query_embedding": query_embedding_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+        "inflight": inflight.stats(),
+    }
+
+@app.get("/llm/stats")
+def llm_stats():
+    return dict(llm_usage, audit=audit_summary())
+
+def _collect_stats():
+    """Samples read from the existing LLM / audit / cache counters at scrape time."""
+    out = [
+        ("reco_llm_calls_total", "counter", "LLM round trips.", {}, llm_usage["calls"]),
+        ("reco_llm_batched_calls_total", "counter", "Multi-product LLM round trips.", {}, llm_usage["batched_calls"]),
+        ("reco_llm_batch_fallbacks_total", "counter", "Products redone per-product after a batched call.",
+         {}, llm_usage["batch_fallbacks"]),
+        ("reco_llm_tokens_total", "counter", "LLM tokens by direction.", {"kind": "input"}, llm_usage["input_tokens"]),
+        ("reco_llm_tokens_total", "counter", "LLM tokens by direction.", {"kind": "output"}, llm_usage["output_tokens"]),
+        ("reco_llm_json_parse_failures_total", "counter", "LLM outputs that were not parseable JSON.",
+         {}, llm_usage["json_parse_failures"]),
+        ("reco_llm_budget_trimmed_calls_total", "counter", "LLM calls whose evidence was cut to PROMPT_TOKEN_BUDGET.",
+         {}, llm_usage["budget_trimmed_calls"]),
+        ("reco_llm_budget_dropped_snippets_total", "counter", "Evidence snippets dropped to fit PROMPT_TOKEN_BUDGET.",
+         {}, llm_usage["budget_dropped_snippets"]),
+    ]
+    for outcome in ("local_ok", "escalated_flagged", "escalated_undecided"):
+        out.append(("reco_pre_audit_total", "counter", "Local pre-audit outcomes.", {"outcome": outcome},
+                    audit_stats[outcome]))
+    out += [
+        ("reco_llm_audits_total", "counter", "Drafts audited by the LLM.", {}, audit_stats["llm_audited"]),
+        ("reco_llm_audit_revisions_total", "counter", "LLM audits that revised the draft.",
+         {}, audit_stats["llm_revised"]),
+    ]
+    caches = {"rationale": rationale_cache, "query_embedding": query_embedding_cache, "retrieval": retrieval_cache}
+    for kind in ("hits", "misses", "evictions"):
+        for name, cache in caches.items():
+            out.append((f"reco_cache_{kind}_total", "counter", f"Cache {kind}.", {"cache": name}, getattr(cache, kind)))
+    for name, cache in caches.items():
+        out.append(("reco_cache_entries", "gauge", "Entries held in memory.", {"cache": name}, cache.stats()["size"]))
+    coalescing = inflight.stats()
+    for kind, st in coalescing.items():
+        out.append(("reco_inflight_calls_total", "counter", "Retrieval / LLM work requested, by kind.",
+                    {"kind": kind}, st["calls"]))
+    for kind, st in coalescing.items():
+        out.append(("reco_inflight_coalesced_total", "counter", "Work requests that joined an identical one in flight.",
+                    {"kind": kind}, st["coalesced"]))
+    snap = snapshot
+    out += [
+        ("reco_catalog_products", "gauge", "Products in the active catalog snapshot.", {}, len(snap.catalog)),
+        ("reco_catalog_info", "gauge", "Active catalog snapshot version.", {"version": snap.version}, 1),
+    ]
+    return out
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render([_collect_stats]), media_type="text/plain; version=0.0.4")
+
+if config.METRICS_ENABLED:
+    @app.middleware("http")
+    async def _timing(request: Request, call_next):
+        """Request latency histogram, and the Server-Timing stage breakdown."""
+        timings: Dict[str, List[float]] = {}
+        token = metrics.request_timings.set(timings)
+        t0 = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            metrics.request_timings.reset(token)
+        dt = time.perf_counter() - t0
+
+        # label by route so unknown paths cannot blow up cardinality
+        path = request.url.path if request.url.path in _ROUTES else "other"
+        metrics.observe("reco_http_request_seconds", dt, path=path)
+        metrics.inc("reco_http_requests_total", path=path, status=str(response.status_code))
+        if timings and (config.TIMING_HEADER or request.headers.get("x-debug-timing") == "1"):
+            response.headers["Server-Timing"] = metrics.server_timing(dict(timings, total=[dt * 1000, 1]))
+        return response
 
 @app.get("/health")
 def health():
     return {"ok": True}
+
+@app.get("/ready")
+def ready():
+    """200 once the catalog, vector index, LLM client (and optional warm-up) are loaded, else 503."""
+    ok = readiness["ready_ms"] is not None
+    return JSONResponse(dict(readiness, ready=ok, catalog_version=snapshot.version), status_code=200 if ok else 503)
+
+@app.get("/catalog")
+def catalog_info():
+    return snapshot.info()
+
+@app.post("/admin/catalog/reload")
+async def admin_reload_catalog():
+    """Rebuild the catalog snapshot from its file now (same as the file watcher)."""
+    try:
+        old, new = await reload_catalog()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Catalog reload failed: {e}")
+    return dict(new.info(), previous_version=old.version, changed=new.version != old.version)
+
+_ROUTES = {r.path for r in app.routes}
+readiness["import_ms"] = round((time.perf_counter() - _t_import) * 1000, 1)
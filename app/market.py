@@ -1,4 +1,16 @@
-from typing import Dict, Any
+import itertools
+from typing import Dict, Any, List, get_args
+
+from .schemas import RateTrend, VolLabel
+
+
+def market_regimes() -> List[Dict[str, str]]:
+    """Every labelled market: rate trend x volatility level."""
+    return [
+        {"interest_rate_trend": r, "volatility_level": v}
+        for r, v in itertools.product(get_args(RateTrend), get_args(VolLabel))
+    ]
+
 
 def market_preferences(market: Dict[str, Any]) -> Dict[str, float]:
     
@@ -0,0 +1,134 @@
+import contextlib
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import config
+
+# Histogram bucket upper bounds, seconds.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NOOP = contextlib.nullcontext()
+_lock = threading.Lock()
+
+# (metric, labels) -> [bucket counts..., +Inf count], sum
+_histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], list] = {}
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+# stage -> [total ms, calls] for the request being served (see timing header in main)
+request_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_timings", default=None)
+
+# name -> (type, help) for everything render() emits
+_HELP = {
+    "reco_stage_seconds": ("histogram", "Time spent in each /recommend pipeline stage."),
+    "reco_http_request_seconds": ("histogram", "HTTP request latency by path."),
+    "reco_http_requests_total": ("counter", "HTTP requests by path and status."),
+    "reco_degraded_items_total": ("counter", "Recommendations served with a template/fallback rationale."),
+    "reco_catalog_reloads_total": ("counter", "Catalog reloads by outcome (swapped, unchanged, failed)."),
+    "reco_retrievals_total": ("counter", "Uncached evidence retrievals by the ranking used (vector, bm25, hybrid)."),
+    "reco_rank_lookups_total": ("counter", "Candidate rankings served precomputed vs scored live."),
+}
+
+
+def observe(name: str, seconds: float, **labels: str) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        h[0][i] += 1
+        h[1] += seconds
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    if not config.METRICS_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class _Stage:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t0
+        observe("reco_stage_seconds", dt, stage=self.name)
+        timings = request_timings.get()
+        if timings is not None:
+            t = timings.setdefault(self.name, [0.0, 0])
+            t[0] += dt * 1000
+            t[1] += 1
+        return False
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage; a shared no-op when metrics are off."""
+    return _Stage(name) if config.METRICS_ENABLED else _NOOP
+
+
+def server_timing(timings: Dict[str, List[float]]) -> str:
+    """Server-Timing header value: total ms per stage (and call count when > 1)."""
+    return ", ".join(
+        f"{name};dur={ms:.1f}" + (f';desc="x{n}"' if n > 1 else "")
+        for name, (ms, n) in timings.items()
+    )
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")  # noqa: E731
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def render(collectors: List[Callable[[], List[Tuple[str, str, str, Dict[str, str], float]]]] = ()) -> str:
+    """
+    Prometheus text exposition of the stage/HTTP histograms and counters,
+    plus samples from `collectors`: each returns (name, type, help, labels,
+    value) tuples read at scrape time (LLM usage, cache stats, ...).
+    """
+    lines: List[str] = []
+    seen = set()
+
+    def header(name: str, typ: str, help_: str) -> None:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {typ}")
+
+    with _lock:
+        histograms = sorted((k, ([*v[0]], v[1])) for k, v in _histograms.items())
+        counters = sorted(_counters.items())
+
+    for (name, labels), (counts, total) in histograms:
+        header(name, *_HELP.get(name, ("histogram", name)))
+        cum = 0
+        for le, c in zip([*map(str, BUCKETS), "+Inf"], counts):
+            cum += c
+            lines.append(f"{name}_bucket{_labels(labels, le=le)} {cum}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {cum}")
+
+    for (name, labels), value in counters:
+        header(name, *_HELP.get(name, ("counter", name)))
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+    for collect in collectors:
+        for name, typ, help_, labels, value in collect():
+            header(name, typ, help_)
+            lines.append(f"{name}{_labels(tuple(labels.items()))} {value}")
+
+    return "\n".join(lines) + "\n"
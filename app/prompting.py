@@ -0,0 +1,112 @@
+import json
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# Token estimate for budgets, the same one SimulatedLLM reports usage with.
+CHARS_PER_TOKEN = 4
+
+# Shortest text shared by two snippets of one doc that is cut as overlap
+# (the splitter repeats up to chunk_overlap characters between chunks).
+MIN_OVERLAP = 20
+
+# Bump when the assembly below changes what the model is sent (part of PROMPT_VERSION).
+FORMAT_VERSION = 1
+
+Evidence = List[Dict[str, str]]
+
+
+def dumps(obj: Any) -> str:
+    """Compact single-line JSON: no spaces after separators, non-ASCII kept as is."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def compact_client(client: Dict[str, Any]) -> Dict[str, Any]:
+    """The profile the model needs: no client_id, constraints sorted."""
+    out = {k: v for k, v in client.items() if k != "client_id"}
+    if "constraints" in out:
+        out["constraints"] = sorted(out["constraints"])
+    return out
+
+
+def compact_market(market: Dict[str, Any]) -> Dict[str, Any]:
+    """Market context without unset fields (macro_theme: null)."""
+    return {k: v for k, v in market.items() if v is not None}
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of a that is a prefix of b, 0 if under MIN_OVERLAP."""
+    head = b[:MIN_OVERLAP]
+    if len(head) < MIN_OVERLAP:
+        return 0
+    p = a.find(head, max(0, len(a) - len(b)))
+    while p != -1:
+        if b.startswith(a[p:]):
+            return len(a) - p
+        p = a.find(head, p + 1)
+    return 0
+
+
+def dedupe_evidence(evidence: Evidence) -> Evidence:
+    """
+    Snippets in rank order with text already included removed: a snippet
+    contained in an earlier one of the same doc is dropped, and the part
+    overlapping an earlier one (either end) is cut.
+    """
+    kept: Evidence = []
+    for e in evidence:
+        text = e["snippet"]
+        for k in kept:
+            if k["doc_id"] != e["doc_id"]:
+                continue
+            if text in k["snippet"]:
+                text = ""
+                break
+            text = text[_overlap(k["snippet"], text):]
+            cut = _overlap(text, k["snippet"])
+            if cut:
+                text = text[:-cut]
+        text = text.strip()
+        if text:
+            kept.append(dict(e, snippet=text))
+    return kept
+
+
+def encode_evidence(evidence: Evidence) -> Dict[str, List[str]]:
+    """{doc_id: [snippet, ...]}: each doc_id once instead of once per snippet."""
+    out: Dict[str, List[str]] = {}
+    for e in evidence:
+        out.setdefault(e["doc_id"], []).append(e["snippet"])
+    return out
+
+
+def decode_evidence(encoded: Any) -> Evidence:
+    """Inverse of encode_evidence (lists of {doc_id, snippet} pass through)."""
+    if isinstance(encoded, dict):
+        return [{"doc_id": d, "snippet": s} for d, snippets in encoded.items() for s in snippets]
+    return list(encoded or [])
+
+
+def fit_to_budget(
+    render: Callable[[List[Evidence]], list], evidences: Sequence[Evidence], budget: int
+) -> Tuple[list, int]:
+    """
+    render(evidences), dropping snippets until the messages fit in budget
+    tokens (0 = no budget): the lowest-ranked snippet of whichever product
+    has the most evidence text left goes first. Only evidence is dropped, so
+    a prompt whose other content alone exceeds the budget is sent anyway.
+    Returns (messages, snippets dropped).
+    """
+    evidences = [list(ev) for ev in evidences]
+    msg = render(evidences)
+    dropped = 0
+    while budget > 0 and sum(estimate_tokens(m.content) for m in msg) > budget:
+        ev = max(evidences, key=lambda ev: sum(len(e["snippet"]) for e in ev))
+        if not ev:
+            break
+        ev.pop()
+        dropped += 1
+        msg = render(evidences)
+    return msg, dropped
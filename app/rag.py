@@ -1,46 +1,465 @@
+import fnmatch
+import hashlib
+import json
+import logging
 import os
-from typing import List, Dict, Any, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Optional, Tuple
 
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
+import numpy as np
+
+from . import config, metrics
+from .cache import TTLCache, stable_hash
+from .backends import make_embeddings
+from .lexical import BM25Index
+from .shared import MappedStrings, file_lock, write_strings
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import Embeddings
 
 DOCS_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "docs")
-INDEX_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "faiss_index")
+INDEX_DIR = config.INDEX_DIR or os.path.join(os.path.dirname(__file__), "..", "data", "faiss_index")
+
+logger = logging.getLogger(__name__)
+
+# query text -> embedding, and (query, k) -> evidence. Queries are built from
+# a small set of fields (see build_query), so both hit very often.
+query_embedding_cache = TTLCache(maxsize=config.RETRIEVAL_CACHE_SIZE, ttl=float("inf"))
+retrieval_cache = TTLCache(maxsize=config.RETRIEVAL_CACHE_SIZE, ttl=float("inf"))
+
+# Hybrid retrieval: query embeddings computed off the request path (see embed_later).
+MAX_PENDING_EMBEDDINGS = 1000
+_embedder: Optional[ThreadPoolExecutor] = None
+_pending: set = set()
+_pending_lock = threading.Lock()
+
+
+class CachedQueryEmbeddings:
+    """
+    Wraps an Embeddings backend and memoizes embed_query.
+    Document embedding (index build) is passed through unchanged.
+    Implements the Embeddings interface without subclassing it, so importing
+    this module does not import langchain.
+    """
+
+    def __init__(self, inner: "Embeddings"):
+        self.inner = inner
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vec = query_embedding_cache.get(text)
+        if vec is None:
+            vec = self.inner.embed_query(text)
+            query_embedding_cache.set(text, vec)
+        return vec
+
+    def embed_queries(self, texts: List[str], batch_size: int = 256) -> None:
+        """Embed many queries in batched calls and fill the cache."""
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i : i + batch_size]
+            for text, vec in zip(batch, self.inner.embed_documents(batch)):
+                query_embedding_cache.set(text, vec)
+
+
+class EvidenceIndex:
+    """
+    Chunk vectors (flat, squared-L2 search) with chunk ids, doc_ids and texts,
+    plus per-doc_id partitions of the chunk positions, and a BM25 index of
+    the same chunks built on first lexical search.
+
+    Chunks carry a doc_id (= product_id), so a product-scoped search only
+    scores that product's few chunks instead of the whole corpus, and can
+    never return another product's text.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        chunk_ids: List[str],
+        doc_ids: List[str],
+        texts,
+        embeddings: "Embeddings",
+    ):
+        self.vectors = vectors
+        self.chunk_ids = chunk_ids
+        self.doc_ids = doc_ids
+        self.texts = texts
+        self.embeddings = embeddings
+
+        positions: Dict[str, List[int]] = {}
+        for pos, doc_id in enumerate(doc_ids):
+            positions.setdefault(doc_id, []).append(pos)
+        # doc_id -> chunk positions, in index order
+        self.partitions: Dict[str, np.ndarray] = {d: np.asarray(pos) for d, pos in positions.items()}
+        self._lexical: Optional[BM25Index] = None
+        self._lexical_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
 
-def build_or_load_vectorstore() -> FAISS:
-    embeddings = OpenAIEmbeddings()
-    if os.path.exists(INDEX_DIR):
-        return FAISS.load_local(INDEX_DIR, embeddings, allow_dangerous_deserialization=True)
+    @property
+    def lexical(self) -> BM25Index:
+        if self._lexical is None:
+            with self._lexical_lock:
+                if self._lexical is None:
+                    self._lexical = BM25Index(self.texts)
+        return self._lexical
 
-    docs: List[Document] = []
-    for fn in os.listdir(DOCS_DIR):
+    def search(
+        self, query: str, k: int = 4, doc_id: Optional[str] = None, mode: str = "vector"
+    ) -> List[Tuple[str, str]]:
+        """
+        (doc_id, chunk text) for the top-k chunks, optionally within one doc_id.
+        mode "vector" embeds the query, "bm25" ranks by the lexical index
+        alone, "hybrid" mixes min-max normalized BM25 and vector scores
+        (config.HYBRID_VECTOR_WEIGHT on the vector side).
+        """
+        if doc_id is None:
+            pos, rows = np.arange(len(self)), None  # rows=None: the whole mapped matrix, no gather
+        else:
+            pos = rows = self.partitions.get(doc_id)
+            if pos is None:
+                return []
+        if not len(pos):
+            return []
+        if mode == "vector":
+            order = np.argsort(self._distances(query, rows), kind="stable")
+        else:
+            score = _minmax(self.lexical.scores(query, pos))
+            if mode == "hybrid":
+                w = config.HYBRID_VECTOR_WEIGHT
+                score = (1 - w) * score + w * _minmax(-self._distances(query, rows))
+            order = np.argsort(-score, kind="stable")
+        top = pos[order[:k]]
+        return [(self.doc_ids[i], self.texts[i]) for i in top]
+
+    def _distances(self, query: str, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Squared L2 distance of the query to the chunks at rows (all chunks if None)."""
+        q = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        if rows is not None:
+            return ((self.vectors[rows] - q) ** 2).sum(axis=1)
+        # slices of the mapped matrix are views: only one block's temporaries at a time
+        out = np.empty(len(self), dtype=np.float32)
+        for i in range(0, len(self), SEARCH_BLOCK_ROWS):
+            out[i : i + SEARCH_BLOCK_ROWS] = ((self.vectors[i : i + SEARCH_BLOCK_ROWS] - q) ** 2).sum(axis=1)
+        return out
+
+
+def _minmax(x: np.ndarray) -> np.ndarray:
+    span = x.max() - x.min()
+    return (x - x.min()) / span if span > 0 else np.zeros_like(x)
+
+
+# rows per block when an unfiltered search scans every chunk vector
+SEARCH_BLOCK_ROWS = 8192
+
+MANIFEST = "manifest.json"
+# what _commit may delete from INDEX_DIR: older versions and the legacy FAISS files
+ARTIFACTS = ("vectors-*.npy", "chunks-*.txt", "chunks-*.json", "index*.faiss", "index*.pkl")
+SPLITTER = {"chunk_size": 450, "chunk_overlap": 80}
+
+
+def _index_files(version: str) -> Dict[str, str]:
+    return {
+        "vectors": os.path.join(INDEX_DIR, f"vectors-{version}.npy"),
+        "texts": os.path.join(INDEX_DIR, f"chunks-{version}.txt"),
+        "meta": os.path.join(INDEX_DIR, f"chunks-{version}.json"),
+    }
+
+
+def _scan_docs() -> Dict[str, Dict[str, str]]:
+    """file name -> {doc_id, text, sha256} for every doc in DOCS_DIR."""
+    out = {}
+    for fn in sorted(os.listdir(DOCS_DIR)):
         if not fn.endswith((".md", ".txt")):
             continue
         path = os.path.join(DOCS_DIR, fn)
         with open(path, "r", encoding="utf-8") as f:
             text = f.read()
         doc_id = os.path.splitext(fn)[0]
-        docs.append(Document(page_content=text, metadata={"doc_id": doc_id}))
+        out[fn] = {"doc_id": doc_id, "text": text, "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest()}
+    return out
+
+
+def _split(fn: str, doc: Dict[str, str]) -> Tuple[List[str], List["Document"]]:
+    # imported here: the splitter is only needed when (re)indexing, and slow to import
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(**SPLITTER)
+    chunks = splitter.split_documents([Document(page_content=doc["text"], metadata={"doc_id": doc["doc_id"]})])
+    ids = [f"{fn}:{doc['sha256'][:12]}:{i}" for i in range(len(chunks))]
+    return ids, chunks
+
+
+def _read_manifest() -> Dict[str, Any]:
+    try:
+        with open(os.path.join(INDEX_DIR, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=450, chunk_overlap=80)
-    chunks = splitter.split_documents(docs)
-    vs = FAISS.from_documents(chunks, embeddings)
+def load_index(embeddings: "Embeddings", manifest: Optional[Dict[str, Any]] = None) -> EvidenceIndex:
+    """
+    Open the index named by the manifest: vectors are memory-mapped from
+    the .npy file, texts from the .txt file; no pickle involved.
+    """
+    manifest = manifest or _read_manifest()
+    files = _index_files(manifest["version"])
+    with open(files["meta"], "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return EvidenceIndex(
+        vectors=np.load(files["vectors"], mmap_mode="r"),
+        chunk_ids=meta["ids"],
+        doc_ids=meta["doc_ids"],
+        texts=MappedStrings(files["texts"], np.asarray(meta["offsets"], dtype=np.int64)),
+        embeddings=embeddings,
+    )
+
+
+def _load_faiss(manifest: Dict[str, Any], embeddings: "Embeddings") -> EvidenceIndex:
+    # previous LangChain FAISS format (pickled docstore); only read to migrate it
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import Embeddings
+
+    Embeddings.register(type(embeddings))  # duck-typed wrapper; FAISS warns on non-Embeddings
+    vs = FAISS.load_local(INDEX_DIR, embeddings, index_name=manifest["index_name"],
+                          allow_dangerous_deserialization=True)
+    n = vs.index.ntotal
+    ids = [vs.index_to_docstore_id[i] for i in range(n)]
+    docs = [vs.docstore.search(cid) for cid in ids]
+    return EvidenceIndex(
+        vectors=vs.index.reconstruct_n(0, n),
+        chunk_ids=ids,
+        doc_ids=[d.metadata.get("doc_id", "unknown") for d in docs],
+        texts=[d.page_content for d in docs],
+        embeddings=embeddings,
+    )
+
+
+def _commit(
+    manifest: Dict[str, Any],
+    chunk_ids: List[str],
+    doc_ids: List[str],
+    texts: List[str],
+    vectors: np.ndarray,
+) -> Dict[str, Any]:
+    """
+    Write the index files under a new version, then atomically replace the
+    manifest that points at them. Readers see either the old or the new version.
+    Files of a version are never rewritten in place, since other processes
+    may have them mapped: an existing version is reused as is, and new files
+    are written under a temp name and renamed.
+    """
+    version = stable_hash(manifest)[:12]
+    manifest = dict(manifest, version=version)
+    files = _index_files(version)
     os.makedirs(INDEX_DIR, exist_ok=True)
-    vs.save_local(INDEX_DIR)
-    return vs
+
+    if not all(os.path.exists(p) for p in files.values()):
+        with open(files["vectors"] + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+        offsets = write_strings(files["texts"] + ".tmp", texts)
+        with open(files["meta"] + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": chunk_ids, "doc_ids": doc_ids, "offsets": offsets.tolist()}, f)
+        for p in files.values():
+            os.replace(p + ".tmp", p)
+
+    path = os.path.join(INDEX_DIR, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+    # only this module's own files: INDEX_DIR may be shared with other data
+    current = {os.path.basename(p) for p in files.values()}
+    for fn in os.listdir(INDEX_DIR):
+        if fn not in current and any(fnmatch.fnmatch(fn.removesuffix(".tmp"), pat) for pat in ARTIFACTS):
+            os.remove(os.path.join(INDEX_DIR, fn))
+    return manifest
+
+
+def reindex(embeddings: Optional["Embeddings"] = None) -> Tuple[EvidenceIndex, Dict[str, List[str]]]:
+    """
+    Bring the on-disk index in line with DOCS_DIR, embedding only new or
+    changed files and dropping chunks of removed ones. Falls back to a
+    full build when there is no manifest (or the chunking/embedding
+    settings changed). Returns (index, {added, changed, removed}).
+    """
+    embeddings = embeddings or CachedQueryEmbeddings(make_embeddings())
+    inner = getattr(embeddings, "inner", embeddings)
+    settings = {"splitter": SPLITTER, "embedding_model": getattr(inner, "model", type(inner).__name__)}
+
+    docs = _scan_docs()
+    manifest = _read_manifest()
+    current = None
+    if manifest.get("settings") == settings:
+        try:
+            current = load_index(embeddings, manifest) if "version" in manifest else _load_faiss(manifest, embeddings)
+        except Exception:
+            logger.exception("Could not load index %s, rebuilding", INDEX_DIR)
+            current = None
+    files = manifest.get("files", {}) if current is not None else {}
+
+    changes = {
+        "added": [fn for fn in docs if fn not in files],
+        "changed": [fn for fn in docs if fn in files and files[fn]["sha256"] != docs[fn]["sha256"]],
+        "removed": [fn for fn in files if fn not in docs],
+    }
+    if current is not None and "version" in manifest and not any(changes.values()):
+        return current, changes
+
+    stale = {cid for fn in changes["changed"] + changes["removed"] for cid in files[fn]["chunk_ids"]}
+    keep = [i for i, cid in enumerate(current.chunk_ids) if cid not in stale] if current is not None else []
+    new_files = {fn: files[fn] for fn in docs if fn in files and fn not in changes["changed"]}
+    new_ids: List[str] = []
+    new_chunks: List["Document"] = []
+    for fn in changes["added"] + changes["changed"]:
+        ids, chunks = _split(fn, docs[fn])
+        new_files[fn] = {"doc_id": docs[fn]["doc_id"], "sha256": docs[fn]["sha256"], "chunk_ids": ids}
+        new_ids += ids
+        new_chunks += chunks
+
+    new_texts = [c.page_content for c in new_chunks]
+    parts = [np.asarray(embeddings.embed_documents(new_texts), dtype=np.float32)] if new_texts else []
+    if keep:
+        parts.insert(0, np.asarray(current.vectors[keep], dtype=np.float32))
+
+    manifest = _commit(
+        {"settings": settings, "files": dict(sorted(new_files.items()))},
+        chunk_ids=[current.chunk_ids[i] for i in keep] + new_ids,
+        doc_ids=[current.doc_ids[i] for i in keep] + [c.metadata["doc_id"] for c in new_chunks],
+        texts=[current.texts[i] for i in keep] + new_texts,
+        vectors=np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32),
+    )
+    return load_index(embeddings, manifest), changes
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource  # no /proc: fall back to peak RSS
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def index_lock():
+    """Cross-process lock held by whoever writes INDEX_DIR (workers starting up, scripts/reindex.py)."""
+    return file_lock(os.path.normpath(INDEX_DIR) + ".lock")
+
+
+def build_or_load_vectorstore() -> EvidenceIndex:
+    t0, rss0 = time.perf_counter(), _rss_mb()
+    # with several workers on a host, the first one in builds or updates the
+    # index; the others wait here and then just map the committed files
+    with index_lock():
+        index, changes = reindex()
+    if any(changes.values()):
+        logger.info("Reindexed docs: %s", {k: len(v) for k, v in changes.items()})
+    if config.RETRIEVER != "vector":
+        index.lexical  # build BM25 now, not on the first request
+    logger.info(
+        "Evidence index ready (%s): %d chunks in %.1f ms, RSS %+.1f MB",
+        config.RETRIEVER, len(index), (time.perf_counter() - t0) * 1000, _rss_mb() - rss0,
+    )
+    retrieval_cache.clear()
+    return index
+
+def build_query(client: Dict[str, Any], market: Dict[str, Any], product: Dict[str, Any]) -> str:
+    query = f"Client goal={client['goal']}, horizon={client['horizon_months']} months, " \
+            f"risk={client['risk_tolerance']}. Market rate={market['interest_rate_trend']}, vol={market['volatility_level']}."
+    return query + " " + product["name"]
 
 def retrieve_evidence(
-    vs: FAISS,
+    vs: EvidenceIndex,
     query: str,
     k: int = 4,
+    doc_id: Optional[str] = None,
 ) -> List[Dict[str, str]]:
-    docs = vs.similarity_search(query, k=k)
-    out = []
-    for d in docs:
-        out.append({
-            "doc_id": d.metadata.get("doc_id", "unknown"),
-            "snippet": d.page_content[:400]
-        })
+    """
+    Top-k evidence for a query, scoped to one doc_id if given (a product
+    without a document gets no evidence), ranked per config.RETRIEVER.
+    Memoized per (query, k, doc_id); the returned list is shared with the
+    cache, treat it as read-only.
+
+    In hybrid mode a query whose embedding is not cached yet is answered
+    by BM25 alone, without waiting on the embedding backend, and is not
+    memoized; the embedding is computed in the background, and later calls
+    get the fused ranking.
+    """
+    key = f"{k}|{doc_id}|{query}"
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        return cached
+
+    mode = config.RETRIEVER
+    if mode == "hybrid" and query not in query_embedding_cache:
+        embed_later(vs, query)
+        metrics.inc("reco_retrievals_total", ranking="bm25")
+        return _evidence(vs.search(query, k=k, doc_id=doc_id, mode="bm25"))
+
+    metrics.inc("reco_retrievals_total", ranking=mode)
+    out = _evidence(vs.search(query, k=k, doc_id=doc_id, mode=mode))
+    retrieval_cache.set(key, out)
     return out
+
+
+def _evidence(hits: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+    return [{"doc_id": d, "snippet": text[:400]} for d, text in hits]
+
+
+def embed_later(vs: EvidenceIndex, query: str) -> None:
+    """
+    Embed query on a background thread (filling query_embedding_cache).
+    At most MAX_PENDING_EMBEDDINGS queries wait; more are skipped, and
+    retried by a later call for the same query.
+    """
+    global _embedder
+    with _pending_lock:
+        if query in _pending or len(_pending) >= MAX_PENDING_EMBEDDINGS:
+            return
+        _pending.add(query)
+        if _embedder is None:
+            _embedder = ThreadPoolExecutor(max_workers=2, thread_name_prefix="embed")
+
+    def run() -> None:
+        try:
+            vs.embeddings.embed_query(query)
+        except Exception as e:
+            logger.warning("Background query embedding failed: %s", e)
+        finally:
+            with _pending_lock:
+                _pending.discard(query)
+
+    _embedder.submit(run)
+
+def warm_up(
+    vs: EvidenceIndex,
+    products: Iterable[Dict[str, Any]],
+    markets: Iterable[Dict[str, Any]],
+    clients: Iterable[Dict[str, Any]],
+    k: int = 4,
+) -> int:
+    """
+    Precompute query embeddings (in batches) and top-k results for every
+    product x market x client bucket. Returns the number of queries warmed.
+    """
+    buckets = {(c["goal"], c["horizon_months"], c["risk_tolerance"]) for c in clients}
+    queries = sorted({
+        (build_query({"goal": g, "horizon_months": h, "risk_tolerance": r}, m, p), p["product_id"])
+        for g, h, r in buckets
+        for m in markets
+        for p in products
+    })
+    if config.RETRIEVER != "bm25":
+        vs.embeddings.embed_queries([q for q, _ in queries])
+    for q, doc_id in queries:
+        retrieve_evidence(vs, q, k=k, doc_id=doc_id)
+    return len(queries)
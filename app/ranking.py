@@ -0,0 +1,87 @@
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .catalog import Catalog
+from .market import market_preferences, market_regimes
+from .rules import EligibilityIndex, ProfileKey
+from .scoring import base_scores, top_ranked
+
+WeightsKey = Tuple[Tuple[str, float], ...]
+
+
+def weights_key(mweights: Dict[str, float]) -> WeightsKey:
+    return tuple(sorted(mweights.items()))
+
+
+class RankIndex:
+    """
+    The first `depth` ranked eligible rows, and their scores, for every
+    market weight vector the labelled regimes produce x every profile of the
+    eligibility index. base_scores depends only on risk_tolerance (part of the
+    profile), the product row and the weights, so these are exactly the
+    lists the live path would compute.
+
+    Built once per catalog snapshot. lookup() returns None for anything not
+    covered: weights from other (e.g. future continuous) market inputs,
+    unindexed profiles, or a shortlist deeper than `depth`. Callers then
+    score live.
+    """
+
+    def __init__(self, catalog: Catalog, eligibility: EligibilityIndex, depth: int):
+        self.depth = depth
+        self._entries: Dict[Tuple[WeightsKey, ProfileKey], Tuple[np.ndarray, np.ndarray]] = {}
+        if depth <= 0:
+            return
+        weights = {weights_key(w): w for w in map(market_preferences, market_regimes())}
+        for pkey, eligible_idx in eligibility.profiles():
+            client = {"risk_tolerance": pkey[0]}
+            for wkey, mweights in weights.items():
+                scores = base_scores(client, catalog, mweights, eligible_idx)
+                order = top_ranked(scores, depth)
+                self._entries[(wkey, pkey)] = (eligible_idx[order], scores[order])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(
+        self, mweights: Dict[str, float], pkey: ProfileKey, n: int
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(ranked rows, scores), at least the first n of them, or None if not precomputed."""
+        if n > self.depth:
+            return None
+        return self._entries.get((weights_key(mweights), pkey))
+
+    def save(self, path: str) -> None:
+        """Entries concatenated into two arrays with offsets, keys as JSON (see open())."""
+        os.makedirs(path, exist_ok=True)
+        keys = list(self._entries)
+        for j, part in enumerate(("rows", "scores")):
+            arrays = [self._entries[k][j] for k in keys]
+            dtype = np.int32 if part == "rows" else np.float64
+            np.save(os.path.join(path, f"ranks.{part}.npy"), np.concatenate(arrays) if arrays else np.zeros(0, dtype))
+        offsets = np.cumsum([0] + [len(self._entries[k][0]) for k in keys])
+        np.save(os.path.join(path, "ranks.offsets.npy"), offsets)
+        with open(os.path.join(path, "ranks.json"), "w", encoding="utf-8") as f:
+            json.dump({"depth": self.depth, "keys": [[list(map(list, w)), [r, m, sorted(flags)]]
+                                                     for w, (r, m, flags) in keys]}, f)
+
+    @classmethod
+    def open(cls, path: str) -> "RankIndex":
+        """Map an index written by save()."""
+        with open(os.path.join(path, "ranks.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        def array(name: str) -> Any:
+            return np.load(os.path.join(path, f"ranks.{name}.npy"), mmap_mode="r")
+
+        rows, scores, off = array("rows"), array("scores"), array("offsets")
+        self = cls.__new__(cls)
+        self.depth = meta["depth"]
+        self._entries = {
+            (tuple((k, v) for k, v in w), (r, m, frozenset(flags))): (rows[off[i]:off[i + 1]], scores[off[i]:off[i + 1]])
+            for i, (w, (r, m, flags)) in enumerate(meta["keys"])
+        }
+        return self
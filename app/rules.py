@@ -1,38 +1,217 @@
-from typing import Dict, Any, List, Tuple
+import json
+import os
+from itertools import combinations
+from typing import Callable, Dict, Any, FrozenSet, Iterator, List, Tuple
+
+import numpy as np
+
+from . import config
+from .cache import TTLCache
+from .catalog import Catalog
+
+LIQUIDITY_MAX_LOCKUP = {"High": 14, "Med": 90, "Low": 3650}
+RISK_LEVELS = range(1, 6)
 
 def _liquidity_max_lockup(liq: str) -> int:
     
-    return {"High": 14, "Med": 90, "Low": 3650}.get(liq, 90)
+    return LIQUIDITY_MAX_LOCKUP.get(liq, 90)
 
-def suitability_filter(
-    client: Dict[str, Any],
-    products: List[Dict[str, Any]],
-) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    eligible = []
-    rejected = []
+# Client constraint -> (rejection reason, catalog -> violation mask).
+# Register new constraint types here; the eligibility index picks them up.
+CONSTRAINT_RULES: Dict[str, Tuple[str, Callable[[Catalog], np.ndarray]]] = {
+    "No-derivatives": ("Client constraint: No-derivatives", lambda c: c.derivatives_exposure),
+    "ESG-only": ("Client constraint: ESG-only", lambda c: ~c.esg),
+}
+
+
+ProfileKey = Tuple[int, int, FrozenSet[str]]  # (risk_tolerance, max lock-up days, constraints)
+
+
+def profile_key(client: Dict[str, Any]) -> ProfileKey:
+    """
+    The part of a client profile that suitability depends on.
+    Unknown constraint strings are ignored.
+    """
+    constraints = frozenset(c for c in client.get("constraints", []) if c in CONSTRAINT_RULES)
+    return (
+        int(client["risk_tolerance"]),
+        _liquidity_max_lockup(client["liquidity_need"]),
+        constraints,
+    )
+
+
+class EligibilityIndex:
+    """
+    Suitability results precomputed for every constraint profile
+    (risk level x liquidity bucket x subset of CONSTRAINT_RULES), so
+    screening a client is a dict lookup instead of a catalog scan.
+
+    Built in one go for one Catalog and never mutated; on catalog change
+    build a new index and swap the reference. save()/open() write it to a
+    directory and map it back read-only, for sharing between processes.
+    """
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+        # violation mask per check, in the order _violations reports reasons
+        self._risk = {r: catalog.risk_level > r for r in RISK_LEVELS}
+        self._lockup = {m: catalog.lockup_days > m for m in set(LIQUIDITY_MAX_LOCKUP.values())}
+        self._constraints = {name: fn(catalog) for name, (_, fn) in CONSTRAINT_RULES.items()}
 
-    max_lock = _liquidity_max_lockup(client["liquidity_need"])
-    no_deriv = "No-derivatives" in client.get("constraints", [])
-    esg_only = "ESG-only" in client.get("constraints", [])
+        self._entries: Dict[ProfileKey, Tuple[np.ndarray, np.ndarray]] = {}
+        names = list(CONSTRAINT_RULES)
+        subsets = [frozenset(c) for n in range(len(names) + 1) for c in combinations(names, n)]
+        for r in RISK_LEVELS:
+            for m in self._lockup:
+                for flags in subsets:
+                    bad = self._risk[r] | self._lockup[m]
+                    for name in flags:
+                        bad = bad | self._constraints[name]
+                    self._entries[(r, m, flags)] = (
+                        np.flatnonzero(~bad).astype(np.int32),
+                        np.flatnonzero(bad).astype(np.int32),
+                    )
+        self._rejected = _rejection_cache()
 
-    for p in products:
-        reasons = []
+    def save(self, path: str) -> None:
+        """Violation masks as one (checks x products) array; per-profile rows concatenated with offsets."""
+        os.makedirs(path, exist_ok=True)
+        masks = {
+            **{f"risk:{r}": v for r, v in self._risk.items()},
+            **{f"lockup:{m}": v for m, v in self._lockup.items()},
+            **{f"constraint:{n}": v for n, v in self._constraints.items()},
+        }
+        np.save(os.path.join(path, "eligibility.masks.npy"), np.stack(list(masks.values())))
+        keys = list(self._entries)
+        for j, part in enumerate(("eligible", "rejected")):
+            arrays = [self._entries[k][j] for k in keys]
+            np.save(os.path.join(path, f"eligibility.{part}.npy"), np.concatenate(arrays))
+            np.save(os.path.join(path, f"eligibility.{part}.offsets.npy"), np.cumsum([0] + [len(a) for a in arrays]))
+        with open(os.path.join(path, "eligibility.json"), "w", encoding="utf-8") as f:
+            json.dump({"masks": list(masks), "profiles": [[r, m, sorted(flags)] for r, m, flags in keys]}, f)
 
-        if int(p["risk_level"]) > int(client["risk_tolerance"]):
-            reasons.append("Exceeds client's risk tolerance")
+    @classmethod
+    def open(cls, path: str, catalog: Catalog) -> "EligibilityIndex":
+        """Map an index written by save() for the same catalog; nothing is recomputed."""
+        with open(os.path.join(path, "eligibility.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
 
-        if int(p["lockup_days"]) > max_lock:
-            reasons.append("Lock-up period does not meet liquidity needs")
+        def array(name):
+            return np.load(os.path.join(path, f"eligibility.{name}.npy"), mmap_mode="r")
 
-        if no_deriv and str(p.get("derivatives_exposure", "false")).lower() == "true":
-            reasons.append("Client constraint: No-derivatives")
+        self = cls.__new__(cls)
+        self.catalog = catalog
+        self._risk, self._lockup, self._constraints = {}, {}, {}
+        for name, mask in zip(meta["masks"], array("masks")):
+            kind, _, key = name.partition(":")
+            if kind == "risk":
+                self._risk[int(key)] = mask
+            elif kind == "lockup":
+                self._lockup[int(key)] = mask
+            else:
+                self._constraints[key] = mask
+        parts = [(array(part), array(f"{part}.offsets")) for part in ("eligible", "rejected")]
+        self._entries = {
+            (r, m, frozenset(flags)): tuple(rows[off[i]:off[i + 1]] for rows, off in parts)
+            for i, (r, m, flags) in enumerate(meta["profiles"])
+        }
+        self._rejected = _rejection_cache()
+        return self
 
-        if esg_only and str(p.get("esg", "false")).lower() != "true":
-            reasons.append("Client constraint: ESG-only")
+    def profiles(self) -> Iterator[Tuple[ProfileKey, np.ndarray]]:
+        """(profile key, eligible row indices) for every indexed profile."""
+        return ((key, entry[0]) for key, entry in self._entries.items())
 
-        if reasons:
-            rejected.append({"product_id": p["product_id"], "reason": "; ".join(reasons)})
-        else:
-            eligible.append(p)
+    def lookup(self, client: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """(eligible row indices, rejected row indices), both in catalog order."""
+        key = profile_key(client)
+        if key in self._entries:
+            return self._entries[key]
+        # risk_tolerance outside RISK_LEVELS: not indexed, scan instead
+        return suitability_screen(client, self.catalog)
 
-    return eligible, rejected
+    def rejected(self, client: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        {product_id, reason} per rejected product (reasons joined by "; "),
+        kept for the REJECTION_CACHE_PROFILES most recent profiles (a list
+        can hold a dict per catalog row). Treat as read-only.
+        """
+        key = profile_key(client)
+        if key not in self._entries:
+            return rejection_reasons(client, self.catalog, self.lookup(client)[1])
+        out = self._rejected.get(key)
+        if out is None:
+            r, m, flags = key
+            checks = [
+                ("Exceeds client's risk tolerance", self._risk[r]),
+                ("Lock-up period does not meet liquidity needs", self._lockup[m]),
+            ] + [
+                (reason, self._constraints[name])
+                for name, (reason, _) in CONSTRAINT_RULES.items() if name in flags
+            ]
+            out = _format_rejections(self.catalog, checks, self._entries[key][1])
+            self._rejected.set(key, out)
+        return out
+
+
+def _rejection_cache() -> TTLCache:
+    return TTLCache(maxsize=config.REJECTION_CACHE_PROFILES, ttl=float("inf"))
+
+
+def _violations(client: Dict[str, Any], catalog: Catalog) -> List[Tuple[str, np.ndarray]]:
+    """
+    One boolean mask per suitability check (True = violates), in the order
+    reasons are reported: risk, lock-up, then CONSTRAINT_RULES.
+    """
+    r, m, flags = profile_key(client)
+    return [
+        ("Exceeds client's risk tolerance", catalog.risk_level > r),
+        ("Lock-up period does not meet liquidity needs", catalog.lockup_days > m),
+    ] + [
+        (reason, fn(catalog)) for name, (reason, fn) in CONSTRAINT_RULES.items() if name in flags
+    ]
+
+
+def _format_rejections(
+    catalog: Catalog,
+    checks: List[Tuple[str, np.ndarray]],
+    rejected_idx: np.ndarray,
+) -> List[Dict[str, Any]]:
+    # one bit per failed check; the reason string is built once per distinct combination
+    codes = np.zeros(len(rejected_idx), dtype=np.int64)
+    for j, (_, mask) in enumerate(checks):
+        codes |= np.asarray(mask[rejected_idx], dtype=np.int64) << j
+    reasons = {
+        code: "; ".join(reason for j, (reason, _) in enumerate(checks) if code >> j & 1)
+        for code in np.unique(codes).tolist()
+    }
+    return [
+        {"product_id": pid, "reason": reasons[code]}
+        for pid, code in zip(catalog.product_id.take(rejected_idx), codes.tolist())
+    ]
+
+
+def suitability_screen(
+    client: Dict[str, Any],
+    catalog: Catalog,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Suitability screen over a Catalog (linear scan).
+    Returns (eligible row indices, rejected row indices), both in catalog order.
+    """
+    bad = np.zeros(len(catalog), dtype=bool)
+    for _, mask in _violations(client, catalog):
+        bad |= mask
+    return np.flatnonzero(~bad), np.flatnonzero(bad)
+
+
+def rejection_reasons(
+    client: Dict[str, Any],
+    catalog: Catalog,
+    rejected_idx: np.ndarray,
+) -> List[Dict[str, Any]]:
+    """
+    Build {product_id, reason} entries (reasons joined by "; "),
+    only for the given rejected rows.
+    """
+    return _format_rejections(catalog, _violations(client, catalog), rejected_idx)
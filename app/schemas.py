@@ -23,6 +23,18 @@ class RecommendRequest(BaseModel):
     client: ClientProfile
     market: MarketContext = MarketContext()
     top_k: int = 3
+    rank_then_explain: Optional[bool] = None  # None -> config.RANK_THEN_EXPLAIN
+    include_shortlist: bool = False  # also return unexplained shortlist entries
+    budget_ms: Optional[int] = Field(default=None, ge=0)  # None -> config.REQUEST_BUDGET_MS, 0 = no budget
+
+class BatchRecommendRequest(BaseModel):
+    items: List[RecommendRequest]
+    max_concurrency: Optional[int] = Field(default=None, ge=1)  # None -> config.BATCH_MAX_CONCURRENCY
+
+class ExplainRequest(BaseModel):
+    client: ClientProfile
+    market: MarketContext = MarketContext()
+    product_ids: List[str]  # e.g. ids taken from a previous response's shortlist
 
 class Evidence(BaseModel):
     doc_id: str
@@ -37,7 +49,20 @@ class RecommendationItem(BaseModel):
     key_risks: List[str]
     who_should_not_buy: List[str]
     evidence: List[Evidence]
+    degraded: bool = False  # template rationale: chain failed or ran out of budget
+
+class ScoredCandidate(BaseModel):
+    product_id: str
+    name: str
+    score: float
 
 class RecommendResponse(BaseModel):
     recommendations: List[RecommendationItem]
     rejected: List[Dict[str, Any]]  # {product_id, reason}
+    shortlist: List[ScoredCandidate] = []  # scored but not explained
+    catalog_version: str = ""  # catalog snapshot the response was computed from
+
+class ExplainResponse(BaseModel):
+    recommendations: List[RecommendationItem]
+    not_eligible: List[str] = []  # requested ids that are rejected or unknown
+    catalog_version: str = ""
@@ -0,0 +1,58 @@
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .catalog import Catalog
+
+
+def base_scores(
+    client: Dict[str, Any],
+    catalog: Catalog,
+    mweights: Dict[str, float],
+    idx: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Deterministic score of catalog rows `idx` (all rows if None) for a
+    client under market weights: 50, plus up to 10 for risk fit, plus the
+    market preferences (low risk, no derivatives, short lock-up), minus a
+    fee penalty.
+    """
+    if idx is None:
+        idx = np.arange(len(catalog))
+    risk = catalog.risk_level[idx]
+    lockup = catalog.lockup_days[idx]
+
+    score = np.full(len(idx), 50.0)
+
+    risk_gap = int(client["risk_tolerance"]) - risk
+    score += np.maximum(0, 10 - np.abs(risk_gap) * 3)
+
+    if mweights["prefer_low_risk"] > 0:
+        score += (6 - risk) * mweights["prefer_low_risk"] * 2
+
+    if mweights["penalize_derivatives"] > 0:
+        score -= np.where(catalog.derivatives_exposure[idx], 20 * mweights["penalize_derivatives"], 0.0)
+
+    if mweights["prefer_short_lockup"] > 0:
+        score += np.maximum(0, 14 - lockup) * mweights["prefer_short_lockup"] * 0.4
+
+    score -= catalog.fees[idx] * 1000
+    return score
+
+
+def rank(scores: np.ndarray) -> np.ndarray:
+    """
+    Positions sorted by score desc; ties keep catalog order,
+    like `list.sort(key=..., reverse=True)`.
+    """
+    return np.argsort(-scores, kind="stable")
+
+
+def top_ranked(scores: np.ndarray, n: int) -> np.ndarray:
+    """rank(scores)[:n] without sorting the whole array (same order, ties included)."""
+    if n >= len(scores):
+        return rank(scores)
+    neg = -scores
+    kth = np.partition(neg, n - 1)[n - 1]
+    cand = np.flatnonzero(neg <= kth)  # the n best plus any ties with the n-th, in catalog order
+    return cand[rank(scores[cand])][:n]
@@ -0,0 +1,69 @@
+import contextlib
+import mmap
+import os
+from typing import Iterable, Iterator, List
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: no cross-process locking
+    fcntl = None
+
+
+class MappedStrings:
+    """
+    Strings stored back to back in one UTF-8 file and read through mmap;
+    offsets[i]:offsets[i+1] is string i. Pages are shared between
+    processes that map the same file.
+    """
+
+    def __init__(self, path: str, offsets: np.ndarray):
+        self.offsets = offsets
+        self._buf = b""
+        if offsets[-1] > 0:
+            with open(path, "rb") as f:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._buf[self.offsets[i] : self.offsets[i + 1]].decode("utf-8")
+
+    def take(self, idx) -> List[str]:
+        """Strings at the given positions (like ndarray.take; one vectorized offsets lookup)."""
+        idx = np.asarray(idx, dtype=np.int64)
+        buf = self._buf
+        return [buf[a:b].decode("utf-8") for a, b in zip(self.offsets[idx].tolist(), self.offsets[idx + 1].tolist())]
+
+
+def write_strings(path: str, items: Iterable[str]) -> np.ndarray:
+    """Write items back to back to path; returns the len(items) + 1 byte offsets."""
+    offsets = [0]
+    with open(path, "wb") as f:
+        for s in items:
+            b = s.encode("utf-8")
+            f.write(b)
+            offsets.append(offsets[-1] + len(b))
+    return np.asarray(offsets, dtype=np.int64)
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Exclusive lock on path across processes on this host (flock), held for
+    the with-block. The first process in does the work; the others block,
+    then usually find it already done.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight work across concurrent requests: the first
+    caller for a key runs fn() as a task, and callers arriving while it is
+    still running await that same task. The entry is dropped as soon as the
+    task finishes; memoizing results is left to the caches.
+
+    Callers wait through asyncio.shield, so a caller that is cancelled
+    (client disconnect, latency budget) leaves the task running for the
+    others. The task is cancelled only when its last caller has gone. An
+    error is raised to every caller of that flight and not remembered.
+
+    Keys are tuples whose first element names the kind of work; stats()
+    reports calls and coalesced calls per kind.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, List[Any]] = {}  # key -> [task, callers waiting]
+        self.calls: Dict[str, int] = {}
+        self.coalesced: Dict[str, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        kind = key[0]
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(fn())
+            flight = self._flights[key] = [task, 0]
+            task.add_done_callback(lambda _: self._drop(key, flight))
+        else:
+            self.coalesced[kind] = self.coalesced.get(kind, 0) + 1
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            flight[1] -= 1
+            if not flight[1] and not task.done():
+                # everyone waiting was cancelled; new callers start a fresh task
+                self._drop(key, flight)
+                task.cancel()
+
+    def _drop(self, key: Hashable, flight: List[Any]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            kind: {
+                "calls": n,
+                "coalesced": self.coalesced.get(kind, 0),
+                "coalesce_ratio": self.coalesced.get(kind, 0) / n if n else 0.0,
+            }
+            for kind, n in sorted(self.calls.items())
+        }
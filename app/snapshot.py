@@ -0,0 +1,155 @@
+import csv
+import glob
+import hashlib
+import io
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+from . import config
+from .cache import stable_hash
+from .catalog import Catalog
+from .market import market_preferences, market_regimes
+from .ranking import RankIndex
+from .rules import CONSTRAINT_RULES, LIQUIDITY_MAX_LOCKUP, RISK_LEVELS, EligibilityIndex
+from .shared import file_lock
+
+logger = logging.getLogger(__name__)
+
+# published versions kept in SHARED_STATE_DIR (the newest ones; workers may still map older)
+KEEP_PUBLISHED = 3
+
+# Bump when the derived indexes change in a way build_key() cannot see
+# (scoring, index layout), so published copies are rebuilt rather than reused.
+INDEX_FORMAT = 1
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    One immutable version of the catalog and everything derived from it.
+    Requests take a reference once and use it throughout, so a reload never
+    changes the catalog under a request that is already running.
+    """
+    version: str  # content hash of the CSV: identical files give identical versions
+    catalog: Catalog
+    eligibility: EligibilityIndex
+    ranks: RankIndex  # precomputed shortlists per market regime x profile
+    path: str
+    mtime_ns: int
+    size: int
+    loaded_at: float  # wall clock
+    load_ms: float
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "products": len(self.catalog),
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "load_ms": round(self.load_ms, 1),
+            "precomputed_rankings": len(self.ranks),
+        }
+
+
+def empty_snapshot() -> CatalogSnapshot:
+    catalog = Catalog.from_records([])
+    eligibility = EligibilityIndex(catalog)
+    return CatalogSnapshot("", catalog, eligibility, RankIndex(catalog, eligibility, 0), "", 0, 0, 0.0, 0.0)
+
+
+def file_stamp(path: str) -> Tuple[int, int]:
+    """(mtime_ns, size): cheap change check, polled by the catalog watcher."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _parse(raw: bytes) -> Catalog:
+    return Catalog.from_records(csv.DictReader(io.StringIO(raw.decode("utf-8"), newline="")))
+
+
+def _build(raw: bytes) -> Tuple[Catalog, EligibilityIndex, RankIndex]:
+    catalog = _parse(raw)
+    eligibility = EligibilityIndex(catalog)
+    return catalog, eligibility, RankIndex(catalog, eligibility, config.RANK_PRECOMPUTE_DEPTH)
+
+
+def build_key() -> str:
+    """
+    Hash of everything besides the CSV that the derived indexes depend on:
+    suitability rules, the regimes' market weights, RANK_PRECOMPUTE_DEPTH.
+    Rule checks are lambdas, so their bytecode and constants stand in for them.
+    """
+    rules = [
+        [name, reason, fn.__code__.co_code.hex(), fn.__code__.co_names, fn.__code__.co_consts]
+        for name, (reason, fn) in CONSTRAINT_RULES.items()
+    ]
+    return stable_hash([
+        INDEX_FORMAT, rules, LIQUIDITY_MAX_LOCKUP, list(RISK_LEVELS),
+        [market_preferences(m) for m in market_regimes()], config.RANK_PRECOMPUTE_DEPTH,
+    ])[:8]
+
+
+def _attach(shared_dir: str, version: str, raw: bytes) -> Tuple[Catalog, EligibilityIndex, RankIndex]:
+    """
+    Map version from shared_dir, publishing it first if no process has yet.
+    Publishing happens under a file lock: one process parses the CSV and
+    builds the derived indexes, the others wait and then only map them.
+    Copies are keyed by the CSV version and build_key(), so a changed rule
+    or depth publishes a new copy instead of mapping a stale one.
+    """
+    target = os.path.join(shared_dir, f"catalog-{version}-{build_key()}")
+    if not os.path.isdir(target):
+        with file_lock(os.path.join(shared_dir, "catalog.lock")):
+            if not os.path.isdir(target):
+                tmp = f"{target}.tmp"
+                shutil.rmtree(tmp, ignore_errors=True)  # left by a process that died mid-publish
+                for part in _build(raw):
+                    part.save(tmp)
+                os.rename(tmp, target)  # readers see all of it or nothing
+                logger.info("Published catalog %s to %s", version, target)
+                _prune(shared_dir)
+    catalog = Catalog.open(target)
+    return catalog, EligibilityIndex.open(target, catalog), RankIndex.open(target)
+
+
+def _prune(shared_dir: str) -> None:
+    # caller holds the lock. Unlinking files another process has mapped is safe.
+    published = sorted(
+        (d for d in glob.glob(os.path.join(shared_dir, "catalog-*")) if not d.endswith(".tmp")),
+        key=os.path.getmtime, reverse=True,
+    )
+    for d in published[KEEP_PUBLISHED:]:
+        shutil.rmtree(d, ignore_errors=True)
+
+
+def load_snapshot(path: str) -> CatalogSnapshot:
+    """
+    Read path once, hash it, and build the catalog and its derived indexes:
+    in this process, or with config.SHARED_STATE_DIR set, by mapping the
+    copy published there (see _attach).
+    """
+    t0 = time.perf_counter()
+    mtime_ns, size = file_stamp(path)
+    with open(path, "rb") as f:
+        raw = f.read()
+    version = hashlib.sha256(raw).hexdigest()[:12]
+    if config.SHARED_STATE_DIR:
+        catalog, eligibility, ranks = _attach(config.SHARED_STATE_DIR, version, raw)
+    else:
+        catalog, eligibility, ranks = _build(raw)
+    return CatalogSnapshot(
+        version=version,
+        catalog=catalog,
+        eligibility=eligibility,
+        ranks=ranks,
+        path=path,
+        mtime_ns=mtime_ns,
+        size=size,
+        loaded_at=time.time(),
+        load_ms=(time.perf_counter() - t0) * 1000,
+    )
+
@@ -1,8 +1,18 @@
+import argparse
+import asyncio
 import json
-import requests
+import os
+import time
 from collections import Counter
 
+import numpy as np
+import requests
+
 API = "http://127.0.0.1:8000/recommend"
+CLIENTS_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "clients.json")
+
+# latency histogram bucket upper bounds (ms)
+BUCKETS_MS = [50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 60000, float("inf")]
 
 MARKETS = [
     {"interest_rate_trend": "rising", "volatility_level": "high"},
@@ -10,29 +20,45 @@ MARKETS = [
     {"interest_rate_trend": "falling", "volatility_level": "low"}
 ]
 
-clients = json.load(open("data/clients.json"))
 
-stats = {
-    "total_runs": 0,
-    "with_evidence": 0,
-    "total_recommendations": 0,
-    "total_rejected": 0,
-    "top1_changes": 0
-}
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", action="store_true", help="send all runs in one /recommend/batch call")
+    parser.add_argument("--load", action="store_true", help="concurrent load test against /recommend")
+    parser.add_argument("--clients", default=CLIENTS_JSON, help="client profiles JSON")
+    parser.add_argument("--api", default=API)
+    load = parser.add_argument_group("load test")
+    load.add_argument("--concurrency", type=int, default=16, help="max requests in flight")
+    load.add_argument("--rate", type=float, default=0.0,
+                      help="target requests/s (open loop); 0 = as fast as --concurrency allows")
+    load.add_argument("--requests", type=int, default=0, help="measured requests (default: one per run)")
+    load.add_argument("--warmup", type=int, default=0, help="unmeasured requests sent first")
+    load.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    load.add_argument("--json-out", default="", help="also write the load-test report as JSON")
+    return parser.parse_args()
 
-top1_by_market = {}
 
-for market in MARKETS:
-    top1_by_market[str(market)] = {}
+def quality(clients, payloads, responses):
+    stats = {
+        "total_runs": 0,
+        "responses": 0,
+        "with_evidence": 0,
+        "total_recommendations": 0,
+        "total_rejected": 0,
+        "top1_changes": 0,
+        "top1_compared": 0
+    }
 
-    for c in clients:
-        payload = {
-            "client": c,
-            "market": market,
-            "top_k": 3
-        }
-        r = requests.post(API, json=payload).json()
+    top1_by_market = {}
+    for market in MARKETS:
+        top1_by_market[str(market)] = {}
+
+    for payload, r in zip(payloads, responses):
+        market, c = payload["market"], payload["client"]
         stats["total_runs"] += 1
+        if r is None:  # request failed
+            continue
+        stats["responses"] += 1
 
         recs = r["recommendations"]
         rej = r["rejected"]
@@ -45,17 +71,178 @@ for market in MARKETS:
                 stats["with_evidence"] += 1
             top1_by_market[str(market)][c["client_id"]] = recs[0]["product_id"]
 
-# market sensitivity
-markets_keys = list(top1_by_market.keys())
-for cid in clients:
-    cid = cid["client_id"]
-    picks = {top1_by_market[m].get(cid) for m in markets_keys}
-    if len(picks) > 1:
-        stats["top1_changes"] += 1
-
-print("=== Evaluation Summary ===")
-print(f"Total runs: {stats['total_runs']}")
-print(f"Evidence coverage rate: {stats['with_evidence']/stats['total_runs']:.2%}")
-print(f"Avg recommendations per run: {stats['total_recommendations']/stats['total_runs']:.2f}")
-print(f"Avg rejected per run: {stats['total_rejected']/stats['total_runs']:.2f}")
-print(f"Market-sensitive top1 ratio: {stats['top1_changes']/len(clients):.2%}")
+    # market sensitivity, over clients with a top-1 under every market
+    # (a failed or unsent request is not a change of pick)
+    markets_keys = list(top1_by_market.keys())
+    for cid in clients:
+        cid = cid["client_id"]
+        picks = [top1_by_market[m].get(cid) for m in markets_keys]
+        if None in picks:
+            continue
+        stats["top1_compared"] += 1
+        if len(set(picks)) > 1:
+            stats["top1_changes"] += 1
+    return stats
+
+
+def print_quality(stats):
+    # ratios are over the responses received; failed requests are reported as errors
+    n = stats["responses"] or 1
+    print("=== Evaluation Summary ===")
+    print(f"Total runs: {stats['total_runs']}  responses: {stats['responses']}")
+    print(f"Evidence coverage rate: {stats['with_evidence']/n:.2%}")
+    print(f"Avg recommendations per run: {stats['total_recommendations']/n:.2f}")
+    print(f"Avg rejected per run: {stats['total_rejected']/n:.2f}")
+    print(f"Market-sensitive top1 ratio: {stats['top1_changes']/(stats['top1_compared'] or 1):.2%} "
+          f"({stats['top1_changes']}/{stats['top1_compared']} clients with a top-1 under every market)")
+
+
+async def load_test(args, payloads):
+    """
+    Send args.requests requests (cycling over payloads) with at most
+    args.concurrency in flight. With --rate, request i is scheduled at
+    i / rate and its latency is measured from that time, so queueing behind
+    a slow server counts (no coordinated omission).
+    Returns (one response per measured request, None where it failed;
+    request i sent payloads[i % len(payloads)]), report).
+    """
+    import httpx
+
+    n = args.requests or len(payloads)
+    slots = asyncio.Semaphore(args.concurrency)
+    responses = [None] * n
+    latencies, errors, degraded = [], Counter(), 0
+
+    async def one(http, i, scheduled=None, measure=True):
+        nonlocal degraded
+        async with slots:
+            t0 = scheduled if scheduled is not None else time.perf_counter()
+            try:
+                r = await http.post(args.api, json=payloads[i % len(payloads)])
+                r.raise_for_status()
+                body = r.json()
+            except Exception as e:
+                if measure:
+                    kind = f"http_{e.response.status_code}" if isinstance(e, httpx.HTTPStatusError) else type(e).__name__
+                    errors[kind] += 1
+                return
+            finally:
+                if measure:
+                    latencies.append((time.perf_counter() - t0) * 1000)
+        if measure:
+            responses[i] = body
+            degraded += sum(x.get("degraded", False) for x in body["recommendations"])
+
+    async def scheduled(http, i, start):
+        at = start + i / args.rate
+        await asyncio.sleep(max(0.0, at - time.perf_counter()))
+        await one(http, i, scheduled=at)
+
+    async def inflight(http):
+        # server-side single-flight counters (empty if the server does not report them)
+        try:
+            r = await http.get(args.api.rsplit("/recommend", 1)[0] + "/cache/stats")
+            return r.json().get("inflight", {})
+        except Exception:
+            return {}
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as http:
+        await asyncio.gather(*(one(http, i, measure=False) for i in range(args.warmup)))
+
+        before = await inflight(http)
+        t0 = time.perf_counter()
+        if args.rate > 0:
+            await asyncio.gather(*(scheduled(http, i, t0) for i in range(n)))
+        else:
+            await asyncio.gather(*(one(http, i) for i in range(n)))
+        wall_s = time.perf_counter() - t0
+        after = await inflight(http)
+
+    coalesced = {}
+    for kind, st in after.items():
+        calls = st["calls"] - before.get(kind, {}).get("calls", 0)
+        joined = st["coalesced"] - before.get(kind, {}).get("coalesced", 0)
+        coalesced[kind] = {"calls": calls, "coalesced": joined, "coalesce_ratio": joined / calls if calls else 0.0}
+
+    lat = np.asarray(latencies)
+    hist = np.histogram(lat, bins=[0] + BUCKETS_MS)[0] if len(lat) else np.zeros(len(BUCKETS_MS), int)
+    report = {
+        "requests": n,
+        "concurrency": args.concurrency,
+        "target_rate": args.rate,
+        "achieved_rate": n / wall_s,
+        "wall_s": wall_s,
+        "errors": dict(errors),
+        "error_count": sum(errors.values()),
+        "degraded_items": degraded,
+        "latency_ms": {
+            "mean": float(lat.mean()) if len(lat) else None,
+            **{f"p{q}": float(np.percentile(lat, q)) if len(lat) else None for q in (50, 90, 95, 99)},
+            "max": float(lat.max()) if len(lat) else None,
+        },
+        "histogram_ms": [
+            {"le": "+Inf" if b == float("inf") else b, "count": int(c)} for b, c in zip(BUCKETS_MS, hist)
+        ],
+        "inflight": coalesced,
+    }
+    return responses, report
+
+
+def print_load(report):
+    print("=== Load Test ===")
+    print(f"Requests: {report['requests']}  concurrency: {report['concurrency']}  "
+          f"target rate: {report['target_rate'] or 'max'}  achieved: {report['achieved_rate']:.1f} req/s")
+    print(f"Errors: {report['error_count']} {report['errors'] or ''}  degraded items: {report['degraded_items']}")
+    lat = report["latency_ms"]
+    if lat["mean"] is not None:
+        print("Latency ms: " + "  ".join(f"{k} {v:.0f}" for k, v in lat.items()))
+    top = max((h["count"] for h in report["histogram_ms"]), default=0) or 1
+    for h in report["histogram_ms"]:
+        print(f"  <= {h['le']:>6} ms  {h['count']:6d}  {'#' * round(40 * h['count'] / top)}")
+    for kind, st in report["inflight"].items():
+        print(f"Coalesced {kind}: {st['coalesced']}/{st['calls']} ({st['coalesce_ratio']:.0%})")
+
+
+def main():
+    args = parse_args()
+    with open(args.clients, "r", encoding="utf-8") as f:
+        clients = json.load(f)
+
+    payloads = [
+        {
+            "client": c,
+            "market": market,
+            "top_k": 3
+        }
+        for market in MARKETS
+        for c in clients
+    ]
+
+    report = None
+    if args.load:
+        responses, report = asyncio.run(load_test(args, payloads))
+        payloads = [payloads[i % len(payloads)] for i in range(len(responses))]
+    elif args.batch:
+        # results stream back as NDJSON in completion order; key them by index
+        responses = [None] * len(payloads)
+        with requests.post(args.api.rstrip("/") + "/batch", json={"items": payloads}, stream=True) as resp:
+            for line in resp.iter_lines():
+                if line:
+                    item = json.loads(line)
+                    responses[item["index"]] = item.get("response")
+    else:
+        responses = [requests.post(args.api, json=p).json() for p in payloads]
+
+    stats = quality(clients, payloads, responses)
+    print_quality(stats)
+    if report is not None:
+        print()
+        print_load(report)
+        if args.json_out:
+            with open(args.json_out, "w", encoding="utf-8") as f:
+                json.dump({"quality": stats, "load": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
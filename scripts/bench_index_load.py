@@ -0,0 +1,83 @@
+"""
+Compare cold-load time and memory of the memory-mapped index (data/faiss_index)
+against the previous LangChain FAISS format (pickled docstore), each loaded in
+a fresh process.
+
+    python scripts/bench_index_load.py [index_dir]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+INDEX_DIR = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else os.path.join(BASE_DIR, "data", "faiss_index")
+
+CHILD = r"""
+import json, sys, time
+sys.path.insert(0, {base!r})
+from langchain_community.embeddings import FakeEmbeddings
+from app import rag
+rag.INDEX_DIR = {index_dir!r}
+
+def mem():
+    # RSS plus the part of it that is private to this process (not shareable)
+    out = {{}}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            k, v = line.split(":", 1)
+            if k in ("Rss", "Private_Clean", "Private_Dirty"):
+                out[k] = int(v.split()[0]) / 1024
+    return out["Rss"], out["Private_Clean"] + out["Private_Dirty"]
+
+emb = FakeEmbeddings(size={dim})
+rss0, priv0 = mem()
+t0 = time.perf_counter()
+if {fmt!r} == "mmap":
+    index = rag.load_index(emb)
+else:
+    from langchain_community.vectorstores import FAISS
+    index = FAISS.load_local({legacy!r}, emb, allow_dangerous_deserialization=True)
+load_ms = (time.perf_counter() - t0) * 1000
+rss1, priv1 = mem()
+print(json.dumps({{"format": {fmt!r}, "load_ms": load_ms,
+                  "rss_mb": rss1 - rss0, "private_mb": priv1 - priv0}}))
+"""
+
+
+def _run(fmt: str, dim: int, legacy: str) -> dict:
+    code = CHILD.format(base=BASE_DIR, index_dir=INDEX_DIR, fmt=fmt, dim=dim, legacy=legacy)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    from langchain_community.embeddings import FakeEmbeddings
+    from langchain_community.vectorstores import FAISS
+    from app import rag
+
+    rag.INDEX_DIR = INDEX_DIR
+    index = rag.load_index(FakeEmbeddings(size=1))
+    dim = index.vectors.shape[1]
+
+    with tempfile.TemporaryDirectory() as legacy:
+        # same chunks and vectors, saved the old way
+        vs = FAISS.from_embeddings(
+            [(index.texts[i], index.vectors[i].tolist()) for i in range(len(index))],
+            FakeEmbeddings(size=dim),
+            metadatas=[{"doc_id": d} for d in index.doc_ids],
+            ids=index.chunk_ids,
+        )
+        vs.save_local(legacy)
+
+        print(f"chunks: {len(index)}, dim: {dim}")
+        for fmt in ("faiss_pickle", "mmap"):
+            r = _run(fmt, dim, legacy)
+            print(f"{r['format']:>13}: load {r['load_ms']:8.1f} ms   "
+                  f"RSS +{r['rss_mb']:7.1f} MB   private +{r['private_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
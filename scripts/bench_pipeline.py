@@ -0,0 +1,238 @@
+"""
+End-to-end benchmark of the real FastAPI app and /recommend pipeline
+against the simulated LLM and embedding backends (app/backends.py): no
+network, no API key. For each catalog size a synthetic catalog, clients
+and docs (scripts/generate_synthetic_data.py) and their vector index are
+built in a temp dir, then requests are driven in-process
+at a fixed concurrency for each top_k.
+
+Reports throughput and p50/p95/p99 latency per stage (rank, retrieve,
+draft, pre_audit, llm_audit, request) and writes them as JSON for
+regression tracking.
+
+    python scripts/bench_pipeline.py --sizes 20,1000,10000,100000 --top-k 1,3,5 \\
+        --requests 200 --concurrency 16 --llm-latency-ms 800 --out bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts"))
+
+from generate_synthetic_data import write_dataset  # noqa: E402
+
+STAGES = defaultdict(list)  # stage -> latencies (ms) of the current run
+
+MARKETS = [
+    {"interest_rate_trend": r, "volatility_level": v}
+    for r in ("rising", "stable", "falling") for v in ("low", "medium", "high")
+]
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="20,1000,10000,100000", help="catalog sizes, comma-separated")
+    ap.add_argument("--top-k", default="1,3,5", help="top_k values, comma-separated")
+    ap.add_argument("--requests", type=int, default=200, help="measured requests per (size, top_k)")
+    ap.add_argument("--warmup", type=int, default=10, help="unmeasured requests before each run")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--clients", type=int, default=500, help="synthetic client pool size")
+    ap.add_argument("--doc-chars", type=int, default=0, help="pad product docs to this many characters")
+    ap.add_argument("--llm-latency-ms", type=float, default=800)
+    ap.add_argument("--llm-jitter-ms", type=float, default=200)
+    ap.add_argument("--llm-failure-rate", type=float, default=0.0)
+    ap.add_argument("--embed-latency-ms", type=float, default=20)
+    ap.add_argument("--embed-jitter-ms", type=float, default=5)
+    ap.add_argument("--embed-failure-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="bench_results.json")
+    return ap.parse_args()
+
+
+def _configure(args) -> None:
+    # app.config reads these at import time
+    os.environ.update({
+        "LLM_BACKEND": "simulated",
+        "EMBEDDINGS_BACKEND": "simulated",
+        "SIM_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "SIM_LLM_JITTER_MS": str(args.llm_jitter_ms),
+        "SIM_LLM_FAILURE_RATE": str(args.llm_failure_rate),
+        "SIM_EMBED_LATENCY_MS": str(args.embed_latency_ms),
+        "SIM_EMBED_JITTER_MS": str(args.embed_jitter_ms),
+        "SIM_EMBED_FAILURE_RATE": str(args.embed_failure_rate),
+        "SIM_SEED": str(args.seed),
+    })
+
+
+def _timed(stage: str, fn):
+    if asyncio.iscoroutinefunction(fn):
+        async def wrapper(*a, **k):
+            t0 = time.perf_counter()
+            try:
+                return await fn(*a, **k)
+            finally:
+                STAGES[stage].append((time.perf_counter() - t0) * 1000)
+    else:
+        def wrapper(*a, **k):
+            t0 = time.perf_counter()
+            try:
+                return fn(*a, **k)
+            finally:
+                STAGES[stage].append((time.perf_counter() - t0) * 1000)
+    return wrapper
+
+
+def _summary(values):
+    if not values:
+        return {"count": 0}
+    a = np.asarray(values)
+    return {
+        "count": len(a),
+        "mean_ms": float(a.mean()),
+        "p50_ms": float(np.percentile(a, 50)),
+        "p95_ms": float(np.percentile(a, 95)),
+        "p99_ms": float(np.percentile(a, 99)),
+    }
+
+
+async def _drive(http, payloads, concurrency: int):
+    slots = asyncio.Semaphore(concurrency)
+    out = {"errors": 0, "items": 0, "degraded": 0}
+
+    async def one(payload):
+        async with slots:
+            t0 = time.perf_counter()
+            try:
+                r = await http.post("/recommend", json=payload)
+                r.raise_for_status()
+                recs = r.json()["recommendations"]
+                out["items"] += len(recs)
+                out["degraded"] += sum(x.get("degraded", False) for x in recs)
+            except Exception:
+                out["errors"] += 1
+            finally:
+                STAGES["request"].append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(one(p) for p in payloads))
+    return out
+
+
+async def run(args):
+    import httpx
+
+    from app import agents, main, rag
+
+    # simulated failures and budget overruns are counted, not logged
+    logging.getLogger("app").setLevel(logging.CRITICAL)
+
+    # per-stage timers around the real pipeline functions
+    main._plan = _timed("rank", main._plan)
+    main._retrieve = _timed("retrieve", main._retrieve)
+    agents.recommend_one = _timed("draft", agents.recommend_one)
+    agents.recommend_many = _timed("draft", agents.recommend_many)
+    agents._local_audit = _timed("pre_audit", agents._local_audit)
+    agents.audit_one = _timed("llm_audit", agents.audit_one)
+    agents.audit_many = _timed("llm_audit", agents.audit_many)
+
+    rng = random.Random(args.seed)
+    results = []
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            with tempfile.TemporaryDirectory() as tmp:
+                t0 = time.perf_counter()
+                data = write_dataset(tmp, size, args.clients, args.doc_chars, seed=args.seed)
+                gen_ms = (time.perf_counter() - t0) * 1000
+                with open(data["clients"], "r", encoding="utf-8") as f:
+                    clients = json.load(f)
+
+                rag.DOCS_DIR, rag.INDEX_DIR = data["docs_dir"], os.path.join(tmp, "index")
+                t0 = time.perf_counter()
+                main.vectorstore = rag.build_or_load_vectorstore()
+                index_ms = (time.perf_counter() - t0) * 1000
+                t0 = time.perf_counter()
+                main.load_catalog(data["catalog"])
+                catalog_ms = (time.perf_counter() - t0) * 1000
+
+                for top_k in [int(k) for k in args.top_k.split(",")]:
+                    for cache in (agents.rationale_cache, rag.retrieval_cache, rag.query_embedding_cache):
+                        cache.clear()
+                    def payloads(n):
+                        return [
+                            {"client": rng.choice(clients), "market": rng.choice(MARKETS), "top_k": top_k}
+                            for _ in range(n)
+                        ]
+                    await _drive(http, payloads(args.warmup), args.concurrency)
+                    STAGES.clear()
+
+                    t0 = time.perf_counter()
+                    counts = await _drive(http, payloads(args.requests), args.concurrency)
+                    wall_s = time.perf_counter() - t0
+
+                    result = {
+                        "catalog_size": size,
+                        "top_k": top_k,
+                        "requests": args.requests,
+                        "concurrency": args.concurrency,
+                        "wall_s": wall_s,
+                        "throughput_rps": args.requests / wall_s,
+                        **counts,
+                        "setup_ms": {"generate": gen_ms, "index_build": index_ms, "catalog_load": catalog_ms},
+                        "chunks": len(main.vectorstore),
+                        "stages": {stage: _summary(v) for stage, v in sorted(STAGES.items())},
+                    }
+                    results.append(result)
+                    _print(result)
+    return results
+
+
+def _print(r) -> None:
+    print(f"\nsize={r['catalog_size']} top_k={r['top_k']}: {r['throughput_rps']:.1f} req/s, "
+          f"errors={r['errors']}, degraded={r['degraded']}/{r['items']}, "
+          f"index build {r['setup_ms']['index_build']:.0f} ms ({r['chunks']} chunks)")
+    for stage, s in r["stages"].items():
+        if s["count"]:
+            print(f"  {stage:>10}: n={s['count']:6d}  p50 {s['p50_ms']:8.2f}  "
+                  f"p95 {s['p95_ms']:8.2f}  p99 {s['p99_ms']:8.2f} ms")
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main() -> None:
+    args = parse_args()
+    _configure(args)
+    results = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({
+            "git_rev": _git_rev(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "args": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print(f"\nwrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
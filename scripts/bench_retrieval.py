@@ -0,0 +1,132 @@
+"""
+Compare evidence retrieval modes on the same chunk index: per-query latency
+of vector search (one embedding call per new query), BM25, and hybrid (BM25
+alone until the query embedding is cached, fused after), and how much of
+their top-k evidence agrees with the vector ranking.
+
+The embedding backend is the simulated one, so its per-call latency stands
+in for the network hop to a remote provider (--embed-latency-ms). Its
+vectors are hashed bags of words, so agreement with BM25 is higher than it
+would be with a semantic embedding model.
+
+    python scripts/bench_retrieval.py [--data-dir data] [--queries 500] [--k 4]
+
+--data-dir can point at a generate_synthetic_data.py output; use
+--doc-chars 3000 or so there, so docs have more chunks than k.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data-dir", default=os.path.join(BASE_DIR, "data"))
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--embed-latency-ms", type=float, default=20)
+    ap.add_argument("--embed-jitter-ms", type=float, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="", help="also write the results as JSON")
+    return ap.parse_args()
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+def main() -> None:
+    args = parse_args()
+    os.environ.update(
+        EMBEDDINGS_BACKEND="simulated",
+        SIM_EMBED_LATENCY_MS=str(args.embed_latency_ms),
+        SIM_EMBED_JITTER_MS=str(args.embed_jitter_ms),
+    )
+    from app import config, rag
+    from app.catalog import Catalog
+    from app.market import market_regimes
+
+    rag.DOCS_DIR = os.path.join(args.data_dir, "docs")
+    catalog = Catalog.from_csv(os.path.join(args.data_dir, "opportunities.csv"))
+    with open(os.path.join(args.data_dir, "clients.json"), "r", encoding="utf-8") as f:
+        clients = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rag.INDEX_DIR = os.path.join(tmp, "index")
+        t0 = time.perf_counter()
+        vs, _ = rag.reindex()
+        index_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        lexical = vs.lexical
+        bm25_s = time.perf_counter() - t0
+        arrays = (lexical.indices, lexical.data, lexical.indptr, lexical.idf, lexical.norm)
+        bm25_mb = sum(a.nbytes for a in arrays) / 2**20
+
+        # product-scoped queries, as /recommend sends them
+        rng = random.Random(args.seed)
+        products = [p for p in catalog.rows(range(len(catalog))) if p["product_id"] in vs.partitions]
+        buckets = sorted({(c["goal"], c["horizon_months"], c["risk_tolerance"]) for c in clients})
+        combos = list(itertools.product(buckets, market_regimes()))
+        queries = list({
+            (rag.build_query({"goal": g, "horizon_months": h, "risk_tolerance": r}, m, p), p["product_id"])
+            for (g, h, r), m in (rng.choice(combos) for _ in range(args.queries))
+            for p in [rng.choice(products)]
+        })
+        multi = sum(len(vs.partitions[d]) > args.k for _, d in queries)
+
+        def run(mode: str, through_cache: bool = False):
+            lat, hits = [], []
+            for q, d in queries:
+                t0 = time.perf_counter()
+                if through_cache:
+                    res = [e["snippet"] for e in rag.retrieve_evidence(vs, q, k=args.k, doc_id=d)]
+                else:
+                    res = [text[:400] for _, text in vs.search(q, k=args.k, doc_id=d, mode=mode)]
+                lat.append((time.perf_counter() - t0) * 1000)
+                hits.append(res)
+            return lat, hits
+
+        rag.query_embedding_cache.clear()
+        results = {"vector": run("vector"), "vector (warm)": run("vector"), "bm25": run("bm25")}
+        rag.query_embedding_cache.clear()
+        rag.retrieval_cache.clear()
+        config.RETRIEVER = "hybrid"
+        results["hybrid (cold)"] = run("hybrid", through_cache=True)  # no embeddings cached yet
+        while rag._pending:
+            time.sleep(0.01)
+        results["hybrid (warm)"] = run("hybrid")  # the background embeddings have landed
+
+    ref = results["vector"][1]
+    print(f"{len(vs)} chunks in {len(vs.partitions)} docs; index build {index_s:.1f} s, "
+          f"BM25 build {bm25_s * 1000:.0f} ms ({bm25_mb:.1f} MB)")
+    print(f"{len(queries)} product-scoped queries, k={args.k}; {multi} of them on docs with more than k chunks")
+    print(f"{'mode':>14}  {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  {'overlap@k':>9}  {'same order':>10}")
+    out = []
+    for name in ("vector", "vector (warm)", "bm25", "hybrid (cold)", "hybrid (warm)"):
+        lat, hits = results[name]
+        overlap = statistics.mean(
+            len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(hits, ref)
+        )
+        same = statistics.mean(a == b for a, b in zip(hits, ref))
+        row = {"mode": name, "p50_ms": _pct(lat, 50), "p95_ms": _pct(lat, 95), "p99_ms": _pct(lat, 99),
+               "overlap_at_k": overlap, "same_order": same}
+        out.append(row)
+        print(f"{name:>14}  {row['p50_ms']:8.3f} {row['p95_ms']:8.3f} {row['p99_ms']:8.3f}  "
+              f"{overlap:9.1%}  {same:10.1%}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "chunks": len(vs), "queries": len(queries), "results": out}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
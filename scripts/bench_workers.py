@@ -0,0 +1,141 @@
+"""
+Per-worker memory of `uvicorn --workers N` with and without SHARED_STATE_DIR,
+on a synthetic catalog (scripts/generate_synthetic_data.py) and simulated
+backends. For each worker count the server is started and the Rss / Pss /
+private memory of each worker process is read from /proc/<pid>/smaps_rollup
+(Linux only): once when ready (idle) and again after some /recommend calls
+(warm: includes per-process caches such as formatted rejection lists).
+
+    python scripts/bench_workers.py --products 200000 --workers 1,2,4
+
+Pss splits shared pages between the processes mapping them, so with the
+shared state it stays nearly flat per worker while the private part shrinks.
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts"))
+
+from generate_synthetic_data import write_dataset  # noqa: E402
+
+MARKET = {"interest_rate_trend": "rising", "volatility_level": "medium"}
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=200000)
+    ap.add_argument("--workers", default="1,2,4", help="worker counts, comma-separated")
+    ap.add_argument("--requests", type=int, default=40, help="warm-up /recommend calls per run")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--out", default="", help="also write the results as JSON")
+    return ap.parse_args()
+
+
+def _mem(pid: int) -> dict:
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            k, _, v = line.partition(":")
+            if k in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                out[k] = int(v.split()[0]) / 1024
+    return {"rss_mb": out["Rss"], "pss_mb": out["Pss"], "private_mb": out["Private_Clean"] + out["Private_Dirty"]}
+
+
+def _workers(parent: int) -> list:
+    # uvicorn's worker processes: spawned children of the supervisor (not its resource tracker)
+    pids = []
+    for d in os.listdir("/proc"):
+        if d.isdigit():
+            try:
+                with open(f"/proc/{d}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                with open(f"/proc/{d}/cmdline", "rb") as f:
+                    cmdline = f.read()
+            except (OSError, IndexError, ValueError):
+                continue
+            if ppid == parent and b"spawn_main" in cmdline:
+                pids.append(int(d))
+    return pids
+
+
+def _per_worker(pids: list) -> dict:
+    mem = [_mem(pid) for pid in pids]
+    out = {k: sum(m[k] for m in mem) / len(mem) for k in mem[0]}
+    out["total_pss_mb"] = sum(m["pss_mb"] for m in mem)
+    return out
+
+
+def run(args, data, workers: int, shared_dir: str) -> dict:
+    env = dict(
+        os.environ,
+        CATALOG_PATH=data["catalog"],
+        INDEX_DIR=os.path.join(os.path.dirname(data["catalog"]), "index"),
+        SHARED_STATE_DIR=shared_dir,
+        LLM_BACKEND="simulated",
+        EMBEDDINGS_BACKEND="simulated",
+        SIM_LLM_LATENCY_MS="5",
+        SIM_LLM_JITTER_MS="0",
+        CATALOG_WATCH_INTERVAL_S="0",
+        METRICS_ENABLED="false",
+    )
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+           "--workers", str(workers), "--log-level", "warning"]
+    server = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, start_new_session=True)
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        t0 = time.perf_counter()
+        with httpx.Client(timeout=60) as http:
+            ready = 0
+            while ready < 3 * workers:  # several 200s in a row, spread over the workers
+                try:
+                    ready = ready + 1 if http.get(url + "/ready").status_code == 200 else 0
+                except httpx.TransportError:
+                    ready = 0
+                time.sleep(0.05)
+            ready_s = time.perf_counter() - t0
+            pids = _workers(server.pid) if workers > 1 else [server.pid]  # one worker: served in-process
+            idle = _per_worker(pids)
+            with open(data["clients"], "r", encoding="utf-8") as f:
+                clients = json.load(f)
+            rng = random.Random(0)
+            for _ in range(args.requests):
+                body = {"client": rng.choice(clients), "market": MARKET, "top_k": 3}
+                http.post(url + "/recommend", json=body).raise_for_status()
+        warm = _per_worker(pids)
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+    return {"workers": len(pids), "shared": bool(shared_dir), "ready_s": ready_s, "idle": idle, "warm": warm}
+
+
+def main() -> None:
+    args = parse_args()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data = write_dataset(os.path.join(tmp, "data"), args.products, 200, max_docs=0)
+        for workers in [int(w) for w in args.workers.split(",")]:
+            for shared_dir in ("", os.path.join(tmp, f"shared-{workers}")):
+                r = run(args, data, workers, shared_dir)
+                results.append(r)
+                print(f"workers={r['workers']} shared={r['shared']!s:5} ready {r['ready_s']:.1f} s")
+                for state in ("idle", "warm"):
+                    p = r[state]
+                    print(f"  {state}: per worker rss {p['rss_mb']:7.1f}  pss {p['pss_mb']:7.1f}  "
+                          f"private {p['private_mb']:7.1f} MB   total pss {p['total_pss_mb']:7.1f} MB")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Parity check for the deterministic pipeline: suitability screen, rejection
+reasons and base_scores ranking over data/opportunities.csv, for every
+constraint profile x labelled market regime, compared against the frozen
+output in scripts/parity_expected.json (recorded from the original
+row-by-row suitability_filter / base_score). Covers the in-memory and the
+saved/mapped indexes, the linear scan, and the precomputed shortlists.
+Exits non-zero on any difference.
+
+    python scripts/check_parity.py            # compare
+    python scripts/check_parity.py --update   # re-record after an intended rule change
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from app.catalog import Catalog  # noqa: E402
+from app.market import market_preferences, market_regimes  # noqa: E402
+from app.ranking import RankIndex  # noqa: E402
+from app.rules import (  # noqa: E402
+    CONSTRAINT_RULES, LIQUIDITY_MAX_LOCKUP, RISK_LEVELS, EligibilityIndex,
+    profile_key, rejection_reasons, suitability_screen,
+)
+from app.scoring import base_scores, rank, top_ranked  # noqa: E402
+
+CSV = os.path.join(BASE_DIR, "data", "opportunities.csv")
+EXPECTED = os.path.join(BASE_DIR, "scripts", "parity_expected.json")
+DEPTH = 6  # precomputed shortlist depth checked against the full ranking
+
+
+def clients():
+    """Every risk level x liquidity bucket x subset of the constraint rules."""
+    names = sorted(CONSTRAINT_RULES)
+    subsets = [list(c) for n in range(len(names) + 1) for c in itertools.combinations(names, n)]
+    for r, liq, cons in itertools.product(RISK_LEVELS, LIQUIDITY_MAX_LOCKUP, subsets):
+        yield {"risk_tolerance": r, "liquidity_need": liq, "constraints": cons}
+
+
+def market_key(market):
+    return f"{market['interest_rate_trend']}/{market['volatility_level']}"
+
+
+def record(catalog: Catalog):
+    """Eligible ids, rejections and the full ranking ([id, score]) per client, from the live path."""
+    out = []
+    for client in clients():
+        eligible, rejected = suitability_screen(client, catalog)
+        ranked = {}
+        for market in market_regimes():
+            scores = base_scores(client, catalog, market_preferences(market), eligible)
+            order = rank(scores)
+            ranked[market_key(market)] = [[catalog.product_id[int(i)], float(s)]
+                                          for i, s in zip(eligible[order], scores[order])]
+        out.append({
+            "client": client,
+            "eligible": [catalog.product_id[int(i)] for i in eligible],
+            "rejected": rejection_reasons(client, catalog, rejected),
+            "ranked": ranked,
+        })
+    return out
+
+
+def dump(cases, f) -> None:
+    """One case per line, so a re-recorded file diffs per profile."""
+    f.write("[\n" + ",\n".join(json.dumps(c) for c in cases) + "\n]\n")
+
+
+def compare(catalog: Catalog, eligibility: EligibilityIndex, ranks: RankIndex, expected, label: str):
+    failures = []
+
+    def ids(rows):
+        return [catalog.product_id[int(i)] for i in rows]
+
+    for case in expected:
+        client, where = case["client"], f"{label} {case['client']}"
+        for how, (eligible, rejected) in (("index", eligibility.lookup(client)),
+                                          ("scan", suitability_screen(client, catalog))):
+            if ids(eligible) != case["eligible"]:
+                failures.append(f"{where}: eligible ({how}) differs")
+            if ids(rejected) != [r["product_id"] for r in case["rejected"]]:
+                failures.append(f"{where}: rejected ({how}) differs")
+        if eligibility.rejected(client) != case["rejected"]:
+            failures.append(f"{where}: rejection reasons (index) differ")
+        if rejection_reasons(client, catalog, suitability_screen(client, catalog)[1]) != case["rejected"]:
+            failures.append(f"{where}: rejection reasons (scan) differ")
+
+        eligible = eligibility.lookup(client)[0]
+        for market in market_regimes():
+            want, mweights = case["ranked"][market_key(market)], market_preferences(market)
+            scores = base_scores(client, catalog, mweights, eligible)
+            full, top = rank(scores), top_ranked(scores, DEPTH)
+            pre_rows, pre_scores = ranks.lookup(mweights, profile_key(client), DEPTH)
+            shortlists = {
+                "rank": (eligible[full], scores[full], want),
+                "top_ranked": (eligible[top], scores[top], want[:DEPTH]),
+                "precomputed": (pre_rows[:DEPTH], pre_scores[:DEPTH], want[:DEPTH]),
+            }
+            for how, (rows, s, expect) in shortlists.items():
+                if [[pid, float(x)] for pid, x in zip(ids(rows), s)] != expect:
+                    failures.append(f"{where} {market_key(market)}: ranking ({how}) differs")
+    return failures
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--update", action="store_true", help="re-record parity_expected.json from the current code")
+    args = ap.parse_args()
+
+    catalog = Catalog.from_csv(CSV)
+    if args.update:
+        with open(EXPECTED, "w", encoding="utf-8") as f:
+            dump(record(catalog), f)
+        print(f"wrote {EXPECTED}")
+        return
+
+    with open(EXPECTED, "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    eligibility = EligibilityIndex(catalog)
+    failures = compare(catalog, eligibility, RankIndex(catalog, eligibility, DEPTH), expected, "memory")
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog.save(tmp)
+        eligibility.save(tmp)
+        RankIndex(catalog, eligibility, DEPTH).save(tmp)
+        mapped = Catalog.open(tmp)
+        mapped_eligibility = EligibilityIndex.open(tmp, mapped)
+        failures += compare(mapped, mapped_eligibility, RankIndex.open(tmp), expected, "mapped")
+
+    for f in failures:
+        print(f)
+    print(f"{len(expected)} profiles x {len(market_regimes())} markets, in memory and mapped: "
+          f"{len(failures)} differences")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Regression cases for the local pre-audit rules (app/audit_rules.py):
+guaranteed-return phrasing with and without a governing negation, and
+draft wording that contradicts the client profile. Exits non-zero if any
+case is decided differently.
+
+    python scripts/check_pre_audit.py
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from app.audit_rules import _profile_conflicts, _promises  # noqa: E402
+
+# (text, flagged?)
+PROMISES = [
+    ("No upfront fee, guaranteed income every quarter.", True),
+    ("A fund with no fees, guaranteed income for life.", True),
+    ("No lock-up and guaranteed returns.", True),
+    ("The strategy is risk-free.", True),
+    ("Returns are not guaranteed.", False),
+    ("There is no guarantee of returns.", False),
+    ("We cannot guarantee any income.", False),
+    ("Capital cannot be guaranteed.", False),
+    ("This is not a risk-free investment.", False),
+]
+
+CAUTIOUS = {"risk_tolerance": 1, "liquidity_need": "High", "constraints": ["No-derivatives", "ESG-only"]}
+OPEN = {"risk_tolerance": 5, "liquidity_need": "Low", "constraints": []}
+
+# (client, text, flagged?)
+CONFLICTS = [
+    (CAUTIOUS, "Suits an aggressive investor.", True),
+    (CAUTIOUS, "The client has low liquidity needs, so the lock-up is acceptable.", True),
+    (CAUTIOUS, "The fund uses derivatives to hedge currency risk.", True),
+    (CAUTIOUS, "A non-ESG fund with low fees.", True),
+    (CAUTIOUS, "Not speculative; the fund does not use derivatives.", False),
+    (CAUTIOUS, "Designed for clients with a very low risk appetite.", False),
+    (OPEN, "Suits an aggressive investor; the fund uses derivatives.", False),
+]
+
+
+def main() -> None:
+    failures = []
+    for text, flagged in PROMISES:
+        if bool(_promises(text)) != flagged:
+            failures.append(f"promise {'missed' if flagged else 'false positive'}: {text!r}")
+    for client, text, flagged in CONFLICTS:
+        if bool(_profile_conflicts(client, text)) != flagged:
+            failures.append(f"profile conflict {'missed' if flagged else 'false positive'}: {text!r} for {client}")
+    for f in failures:
+        print(f)
+    print(f"{len(PROMISES) + len(CONFLICTS) - len(failures)}/{len(PROMISES) + len(CONFLICTS)} cases ok")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,6 @@ BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 DOCS_DIR = os.path.join(DATA_DIR, "docs")
 
-os.makedirs(DOCS_DIR, exist_ok=True)
-
 products = [
     # product_id, name, type, risk_level, lockup_days, fees, derivatives_exposure, esg
     ("opp_001", "Short Duration Bond Fund", "fund", 2, 7, 0.006, "false", "true"),
@@ -207,7 +205,30 @@ def meta_for(p):
         not_fit=not_fit
     )
 
+def render_doc(p):
+    product_id, name, typ, risk_level, lockup_days, fees, deriv, esg = p
+    meta = meta_for(p)
+    tpl = doc_templates.get(typ, doc_templates["fund"])
+    return tpl.format(
+        name=name,
+        risk_level=risk_level,
+        lockup_days=lockup_days,
+        fees=fees,
+        assets=meta["assets"],
+        drivers=meta["drivers"],
+        objective=meta["objective"],
+        risk_desc=meta["risk_desc"],
+        goal_fit=meta["goal_fit"],
+        horizon_fit=meta["horizon_fit"],
+        risk_fit=meta["risk_fit"],
+        extra_risk=meta["extra_risk"],
+        not_fit=meta["not_fit"],
+        rate_sens=meta["rate_sens"],
+    )
+
 def main():
+    os.makedirs(DOCS_DIR, exist_ok=True)
+
     # write CSV
     csv_path = os.path.join(DATA_DIR, "opportunities.csv")
     with open(csv_path, "w", newline="", encoding="utf-8") as f:
@@ -218,28 +239,9 @@ def main():
 
     # write docs
     for p in products:
-        product_id, name, typ, risk_level, lockup_days, fees, deriv, esg = p
-        meta = meta_for(p)
-        tpl = doc_templates.get(typ, doc_templates["fund"])
-        content = tpl.format(
-            name=name,
-            risk_level=risk_level,
-            lockup_days=lockup_days,
-            fees=fees,
-            assets=meta["assets"],
-            drivers=meta["drivers"],
-            objective=meta["objective"],
-            risk_desc=meta["risk_desc"],
-            goal_fit=meta["goal_fit"],
-            horizon_fit=meta["horizon_fit"],
-            risk_fit=meta["risk_fit"],
-            extra_risk=meta["extra_risk"],
-            not_fit=meta["not_fit"],
-            rate_sens=meta["rate_sens"],
-        )
-        out_path = os.path.join(DOCS_DIR, f"{product_id}.md")
+        out_path = os.path.join(DOCS_DIR, f"{p[0]}.md")
         with open(out_path, "w", encoding="utf-8") as f:
-            f.write(content)
+            f.write(render_doc(p))
 
     print("✅ Generated:")
     print(f"- {csv_path}")
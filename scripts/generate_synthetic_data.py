@@ -0,0 +1,193 @@
+"""
+Seeded, parametric generator for large synthetic catalogs, client sets and
+document corpora (load tests, scaling benchmarks). Rows are streamed to
+disk one at a time, so million-row catalogs do not need to fit in memory.
+The same seed and arguments always produce the same files.
+
+    python scripts/generate_synthetic_data.py --products 1000000 --clients 10000 \\
+        --doc-chars 1500 --max-docs 100000 --seed 7 --out-dir data/synthetic
+
+Writes <out-dir>/opportunities.csv, <out-dir>/clients.json and
+<out-dir>/docs/<product_id>.md (the first --max-docs products), in the same
+formats as data/.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, Iterator, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_sample_data import meta_for, render_doc  # noqa: E402
+
+COLUMNS = ["product_id", "name", "type", "risk_level", "lockup_days", "fees", "derivatives_exposure", "esg"]
+
+# type -> (share of catalog, risk level weights 1..5, lock-up days choices, median fee,
+#          P(derivatives), P(esg))
+PRODUCT_TYPES = {
+    "fund": (0.50, [0.10, 0.30, 0.30, 0.20, 0.10], [1, 7, 14, 30, 60, 90], 0.009, 0.10, 0.45),
+    "bond": (0.20, [0.35, 0.40, 0.20, 0.05, 0.00], [7, 14, 30, 90, 180], 0.005, 0.05, 0.35),
+    "deposit": (0.12, [1.00, 0.00, 0.00, 0.00, 0.00], [30, 90, 180, 365], 0.0, 0.0, 0.60),
+    "structured": (0.10, [0.00, 0.00, 0.25, 0.40, 0.35], [180, 365, 730], 0.013, 1.0, 0.05),
+    "alternative": (0.08, [0.00, 0.00, 0.10, 0.50, 0.40], [365, 730, 1095], 0.015, 0.15, 0.10),
+}
+NAME_PARTS = {
+    "fund": (["Global", "Asia", "US", "Europe", "EM", "Dividend", "Quality", "Low Volatility", "Thematic"],
+             ["Equity Fund", "Bond Fund", "Balanced Fund", "Income Fund", "Allocation Fund"]),
+    "bond": (["Treasury", "Corporate", "Municipal", "Floating Rate", "Inflation-Linked", "Green"],
+             ["Bond Ladder", "Note Basket", "Bond (3Y)", "Bond (5Y)"]),
+    "deposit": (["SGD", "USD", "EUR", "Short-Term", "Step-Up"], ["Fixed Deposit", "Time Deposit"]),
+    "structured": (["Capital Protected", "Range Accrual", "Autocallable", "Leveraged", "Dual Currency"],
+                   ["Note", "Equity-Linked Note", "Index Note"]),
+    "alternative": (["Private Credit", "Infrastructure", "Real Estate", "Private Equity", "Hedge"],
+                    ["Income Fund", "Opportunities Fund", "Feeder Fund"]),
+}
+# client risk tolerance 1..5 and, per tolerance, (horizon choices, goal weights Income/Growth/Preservation)
+RISK_TOLERANCE_WEIGHTS = [0.15, 0.30, 0.30, 0.17, 0.08]
+GOALS = ["Income", "Growth", "Preservation"]
+CLIENT_BY_RISK = {
+    1: ([3, 6, 12], [0.3, 0.0, 0.7]),
+    2: ([6, 12, 24], [0.6, 0.1, 0.3]),
+    3: ([12, 24, 36, 60], [0.4, 0.5, 0.1]),
+    4: ([24, 36, 60, 120], [0.2, 0.8, 0.0]),
+    5: ([36, 60, 120, 240], [0.1, 0.9, 0.0]),
+}
+# filler sentences for documents longer than the base template
+FILLER = [
+    "Performance of {name} depends on {drivers}.",
+    "Past results for {assets} do not indicate future returns.",
+    "Under normal conditions redemptions settle within {lockup_days} days.",
+    "The risk level of {risk_level}/5 reflects {risk_desc} expected volatility.",
+    "Costs of approximately {fees} are deducted from returns.",
+    "Exposure to {assets} can be affected by changes in interest rates and credit conditions.",
+    "Outcomes may differ materially across market regimes.",
+    "Investors should read the offering documents for {name} before investing.",
+    "The manager may adjust allocations within the stated mandate.",
+    "Currency movements can add to or offset underlying returns.",
+]
+
+
+def iter_products(n: int, seed: int) -> Iterator[Tuple[Any, ...]]:
+    """n product rows (generate_sample_data tuple layout), one at a time."""
+    rng = random.Random(f"{seed}:products")
+    types = list(PRODUCT_TYPES)
+    shares = [PRODUCT_TYPES[t][0] for t in types]
+    width = max(3, len(str(n)))
+    for i in range(1, n + 1):
+        typ = rng.choices(types, shares)[0]
+        _, risk_w, lockups, median_fee, p_deriv, p_esg = PRODUCT_TYPES[typ]
+        prefixes, suffixes = NAME_PARTS[typ]
+        risk = rng.choices(range(1, 6), risk_w)[0]
+        fees = round(min(0.03, median_fee * rng.lognormvariate(0, 0.3)), 4) if median_fee else 0.0
+        yield (
+            f"opp_{i:0{width}d}",
+            f"{rng.choice(prefixes)} {rng.choice(suffixes)} {i}",
+            typ,
+            risk,
+            rng.choice(lockups),
+            fees,
+            str(rng.random() < p_deriv).lower(),
+            str(rng.random() < p_esg).lower(),
+        )
+
+
+def iter_clients(m: int, seed: int) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(f"{seed}:clients")
+    width = max(3, len(str(m)))
+    for i in range(1, m + 1):
+        risk = rng.choices(range(1, 6), RISK_TOLERANCE_WEIGHTS)[0]
+        horizons, goal_w = CLIENT_BY_RISK[risk]
+        horizon = rng.choice(horizons)
+        liquidity = "High" if horizon <= 6 else rng.choices(["Low", "Med", "High"], [0.4, 0.4, 0.2])[0]
+        yield {
+            "client_id": f"c{i:0{width}d}",
+            "risk_tolerance": risk,
+            "horizon_months": horizon,
+            "goal": rng.choices(GOALS, goal_w)[0],
+            "liquidity_need": liquidity,
+            "constraints": [c for c, p in (("ESG-only", 0.2), ("No-derivatives", 0.25)) if rng.random() < p],
+        }
+
+
+def synthetic_doc(p: Tuple[Any, ...], doc_chars: int, seed: int) -> str:
+    """Template doc for p, padded with filler paragraphs to ~doc_chars."""
+    text = render_doc(p)
+    if len(text) >= doc_chars:
+        return text
+    # seeded per product, so a doc does not depend on which others were written
+    rng = random.Random(f"{seed}:doc:{p[0]}")
+    meta = meta_for(p)
+    fields = dict(meta, name=p[1], risk_level=p[3], lockup_days=p[4], fees=p[5])
+    parts = [text, "\n## Details\n"]
+    size = len(text)
+    while size < doc_chars:
+        para = " ".join(rng.choice(FILLER).format(**fields) for _ in range(4)) + "\n\n"
+        parts.append(para)
+        size += len(para)
+    return "".join(parts)
+
+
+def write_dataset(
+    out_dir: str,
+    products: int,
+    clients: int,
+    doc_chars: int = 0,
+    max_docs: int = -1,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Stream the catalog CSV, clients JSON and product docs into out_dir.
+    max_docs < 0 writes a doc for every product. Returns paths and counts.
+    """
+    docs_dir = os.path.join(out_dir, "docs")
+    os.makedirs(docs_dir, exist_ok=True)
+    csv_path = os.path.join(out_dir, "opportunities.csv")
+    clients_path = os.path.join(out_dir, "clients.json")
+
+    n_docs = 0
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(COLUMNS)
+        for p in iter_products(products, seed):
+            w.writerow(p)
+            if max_docs < 0 or n_docs < max_docs:
+                with open(os.path.join(docs_dir, f"{p[0]}.md"), "w", encoding="utf-8") as d:
+                    d.write(synthetic_doc(p, doc_chars, seed))
+                n_docs += 1
+
+    # a JSON array, written item by item
+    with open(clients_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, c in enumerate(iter_clients(clients, seed)):
+            f.write(("," if i else "") + "\n  " + json.dumps(c, ensure_ascii=False))
+        f.write("\n]\n")
+
+    return {"catalog": csv_path, "clients": clients_path, "docs_dir": docs_dir,
+            "products": products, "client_count": clients, "docs": n_docs}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=1000)
+    ap.add_argument("--clients", type=int, default=100)
+    ap.add_argument("--doc-chars", type=int, default=0, help="pad docs to at least this many characters")
+    ap.add_argument("--max-docs", type=int, default=-1, help="write docs for the first N products only (-1 = all)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out-dir", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                      "data", "synthetic"))
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    out = write_dataset(args.out_dir, args.products, args.clients, args.doc_chars, args.max_docs, args.seed)
+    print(f"Generated in {time.perf_counter() - t0:.1f} s:")
+    print(f"- {out['catalog']}  ({out['products']} products)")
+    print(f"- {out['clients']}  ({out['client_count']} clients)")
+    print(f"- {out['docs_dir']}/*.md  ({out['docs']} files)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Measure LLM round trips and input tokens per /recommend request for
+per-product prompts vs multi-product (BATCHED_PROMPTS) prompts, over
+clients.json x 3 market scenarios. Each is counted twice: the baseline
+(the templates before compact assembly, filled with the raw inputs: full
+dicts, spaced JSON, every retrieved chunk as is) and as the agents
+assemble them now (current templates, compact JSON, overlapping chunks
+deduped, PROMPT_TOKEN_BUDGET applied). No API calls: prompts are only formatted and
+counted with tiktoken.
+
+    python scripts/prompt_savings.py [--top-k 3] [--data-dir data]
+
+--data-dir can point at a generate_synthetic_data.py output (its docs are
+longer, so retrieval returns overlapping chunks).
+"""
+import argparse
+import json
+import os
+import sys
+
+import tiktoken
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from app import agents  # noqa: E402
+from app.catalog import Catalog  # noqa: E402
+from app.market import market_preferences  # noqa: E402
+from app.prompting import dumps, encode_evidence  # noqa: E402
+from app.rag import SPLITTER  # noqa: E402
+from app.rules import EligibilityIndex  # noqa: E402
+from app.scoring import base_scores, rank  # noqa: E402
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: E402
+
+MARKETS = [
+    {"interest_rate_trend": "rising", "volatility_level": "high", "macro_theme": None},
+    {"interest_rate_trend": "stable", "volatility_level": "medium", "macro_theme": None},
+    {"interest_rate_trend": "falling", "volatility_level": "low", "macro_theme": None},
+]
+# the templates before compact prompt assembly (user messages; the system
+# messages are agents' _RECOMMENDER/_AUDITOR text plus the JSON-only rule)
+_JSON_ONLY = "You MUST output strictly valid JSON only (no markdown, no extra text)."
+_RECO_SCHEMA = "{{\"why_client_fit\": string, \"why_market_fit\": string, " \
+               "\"key_risks\": [string], \"who_should_not_buy\": [string]}}"
+_AUDIT_SCHEMA = "{{\"is_ok\": boolean, \"issues\": [string], \"revised\": " + _RECO_SCHEMA + "}}"
+_RECO_SYSTEM = agents._RECOMMENDER[:-len("If evidence is insufficient, explicitly say so in the reasons. ")] \
+    + _JSON_ONLY + " If evidence is insufficient, explicitly say so in the reasons."
+_AUDIT_SYSTEM = agents._AUDITOR + _JSON_ONLY
+BASELINE_SPECS = {
+    "RECOMMEND_PROMPT": [("system", _RECO_SYSTEM), (
+        "user",
+        "Client profile (JSON):\n{client}\n\nMarket context (JSON):\n{market}\n\n"
+        "Candidate product (structured fields JSON):\n{product}\n\n"
+        "Evidence snippets (RAG, list of dicts):\n{evidence}\n\n"
+        "Task: Output JSON ONLY with this schema:\n" + _RECO_SCHEMA,
+    )],
+    "AUDIT_PROMPT": [("system", _AUDIT_SYSTEM), (
+        "user",
+        "Client (JSON):\n{client}\n\nMarket (JSON):\n{market}\n\nProduct (JSON):\n{product}\n\n"
+        "Draft recommendation JSON:\n{draft}\n\nEvidence snippets:\n{evidence}\n\n"
+        "Output JSON ONLY with this schema:\n" + _AUDIT_SCHEMA,
+    )],
+    "RECOMMEND_MANY_PROMPT": [("system", _RECO_SYSTEM), (
+        "user",
+        "Client profile (JSON):\n{client}\n\nMarket context (JSON):\n{market}\n\n"
+        "Candidate products (JSON list; each has product_id, structured fields "
+        "and its own RAG evidence snippets):\n{products}\n\n"
+        "Task: For EACH candidate, using only its own evidence, output JSON ONLY with this schema:\n"
+        "{{\"items\": [{{\"product_id\": string, " + _RECO_SCHEMA[2:] + "]}}",
+    )],
+    "AUDIT_MANY_PROMPT": [("system", _AUDIT_SYSTEM), (
+        "user",
+        "Client (JSON):\n{client}\n\nMarket (JSON):\n{market}\n\n"
+        "Products (JSON list; each has product_id, product fields, its draft "
+        "recommendation and its own evidence snippets):\n{items}\n\n"
+        "Audit EACH product separately. Output JSON ONLY with this schema:\n"
+        "{{\"items\": [{{\"product_id\": string, " + _AUDIT_SCHEMA[2:] + "]}}",
+    )],
+}
+
+# representative draft, used for the audit prompts
+DRAFT = {
+    "why_client_fit": "The product's risk level and lock-up are within the client's tolerance and liquidity needs.",
+    "why_market_fit": "In the current rate and volatility regime the product's profile is comparatively defensive.",
+    "key_risks": ["Market risk and NAV fluctuations", "Interest rate risk"],
+    "who_should_not_buy": ["Clients who cannot accept capital fluctuations"],
+}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--top-k", type=int, default=3)
+    ap.add_argument("--data-dir", default=os.path.join(BASE_DIR, "data"))
+    args = ap.parse_args()
+
+    try:
+        count = tiktoken.encoding_for_model("gpt-4o-mini").encode
+    except Exception:
+        # BPE file not available offline: ~4 characters per token
+        print("tiktoken encoding unavailable, using a 4-chars-per-token estimate")
+        count = lambda text: range(len(text) // 4)  # noqa: E731
+
+    def tokens(messages) -> int:
+        return sum(len(count(m.content)) for m in messages)
+
+    catalog = Catalog.from_csv(os.path.join(args.data_dir, "opportunities.csv"))
+    index = EligibilityIndex(catalog)
+    with open(os.path.join(args.data_dir, "clients.json"), "r", encoding="utf-8") as f:
+        clients = json.load(f)
+
+    # scoped retrieval returns (up to) 4 chunks of the product's own doc
+    splitter = RecursiveCharacterTextSplitter(**SPLITTER)
+    docs_dir = os.path.join(args.data_dir, "docs")
+
+    def evidence(doc_id: str):
+        path = os.path.join(docs_dir, doc_id + ".md")
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [{"doc_id": doc_id, "snippet": c[:400]} for c in splitter.split_text(f.read())[:4]]
+
+    baseline = {name: ChatPromptTemplate.from_messages(spec) for name, spec in BASELINE_SPECS.items()}
+
+    def raw(name, client, market, evs, fields):
+        # the baseline templates filled the pre-compaction way
+        return baseline[name].format_messages(
+            client=json.dumps(client, ensure_ascii=False), market=json.dumps(market, ensure_ascii=False),
+            **fields(evs, lambda o: json.dumps(o, ensure_ascii=False), lambda ev: ev))
+
+    def compact(name, client, market, evs, fields):
+        return agents._format(name, client, market, evs, lambda evs: fields(evs, dumps, encode_evidence))
+
+    totals = {(mode, kind): {"calls": 0, "tokens": 0} for mode in ("raw", "compact") for kind in ("single", "batched")}
+    runs = 0
+    for market in MARKETS:
+        for client in clients:
+            eligible, _ = index.lookup(client)
+            scores = base_scores(client, catalog, market_preferences(market), eligible)
+            products = catalog.rows(eligible[rank(scores)][: args.top_k])
+            if not products:
+                continue
+            runs += 1
+            evs = [evidence(p["product_id"]) for p in products]
+
+            for mode, fmt in (("raw", raw), ("compact", compact)):
+                single, batched = totals[mode, "single"], totals[mode, "batched"]
+                for p, ev in zip(products, evs):
+                    single["tokens"] += tokens(fmt("RECOMMEND_PROMPT", client, market, [ev], lambda e, js, enc: {
+                        "product": js(p), "evidence": js(enc(e[0]))}))
+                    single["tokens"] += tokens(fmt("AUDIT_PROMPT", client, market, [ev], lambda e, js, enc: {
+                        "product": js(p), "evidence": js(enc(e[0])), "draft": js(DRAFT)}))
+                    single["calls"] += 2
+
+                batched["tokens"] += tokens(fmt("RECOMMEND_MANY_PROMPT", client, market, evs, lambda e, js, enc: {
+                    "products": js([dict(p, evidence=enc(ev)) for p, ev in zip(products, e)])}))
+                batched["tokens"] += tokens(fmt("AUDIT_MANY_PROMPT", client, market, evs, lambda e, js, enc: {
+                    "items": js([dict(p, draft=DRAFT, evidence=enc(ev)) for p, ev in zip(products, e)])}))
+                batched["calls"] += 2
+
+    print(f"runs: {runs}, top_k: {args.top_k}")
+    for (mode, kind), r in totals.items():
+        print(f"{mode:>8} {kind:>8}: {r['calls'] / runs:5.2f} round trips/request, "
+              f"{r['tokens'] / runs:8.0f} input tokens/request")
+    for kind in ("single", "batched"):
+        saved = 1 - totals["compact", kind]["tokens"] / totals["raw", kind]["tokens"]
+        print(f"compaction saves {saved:.0%} input tokens ({kind})")
+    single, batched = totals["compact", "single"], totals["compact", "batched"]
+    print(f"batching saves {1 - batched['calls'] / single['calls']:.0%} round trips, "
+          f"{1 - batched['tokens'] / single['tokens']:.0%} input tokens (compact)")
+    print(f"over budget: {agents.llm_usage['budget_trimmed_calls']} calls, "
+          f"{agents.llm_usage['budget_dropped_snippets']} snippets dropped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from app.rag import index_lock, reindex  # noqa: E402
+
+# Embeds only new/changed docs in data/docs and drops removed ones. Takes the
+# same lock as app startup, so it never writes the index alongside a worker.
+with index_lock():
+    _, changes = reindex()
+for kind, files in changes.items():
+    print(f"{kind}: {len(files)}", *(f"  {fn}" for fn in files), sep="\n")